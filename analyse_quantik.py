@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from game_quantik import QuantikAI, format_move, parse_move
+from gamelog_quantik import GameLogReader
+"""
+offline analysis of many positions: each position, given by an id and the moves leading to it,
+is searched as by minimax_move without playing a move, in worker processes. results are
+streamed in order of completion, each with the id of its position.
+
+usage: python analyse_quantik.py positions.txt [--depth 5 | --time 0.5 | --nodes 100000] [--workers 8]
+positions are read from the file or stdin, one per line: an id followed by the moves, e.g.
+"g1 00C 11H 23T". with --game-log, all positions of the games in a game log are analysed instead,
+with id game:ply. results are written to stdout as json lines
+"""
+
+
+def analyse_position(move_sequence, depth=None, time_budget=None, node_budget=None, seed=None,
+                     cancel_event=None):
+    """ result of QuantikAI.analyse for the position after move_sequence (moves as tuples or in
+    the notation of format_move), with moves in the notation of format_move. the search stops
+    early when cancel_event (anything with is_set()) is set, see QuantikAI.cancel_event.
+    raises ValueError for a move that is not possible """
+    if seed is not None:
+        # moves of equal value are ordered randomly, seeded for reproducible results
+        random.seed(seed)
+    ai = QuantikAI(verbose_output=False)
+    ai.cancel_event = cancel_event
+    for move in move_sequence:
+        if isinstance(move, str):
+            move = parse_move(move)
+        if ai.winner or move not in ai.get_possible_moves():
+            raise ValueError("move %s is not possible" % format_move(move))
+        ai.make_move(move)
+    result = ai.analyse(depth=depth, time_budget=time_budget, node_budget=node_budget)
+    if result is None:
+        return {"game_over": True, "winner": ai.winner or "draw"}
+    return dict(result, move=format_move(result["move"]), pv=[format_move(m) for m in result["pv"]])
+
+
+def _analyse_or_error(move_sequence, depth, time_budget, node_budget, seed):
+    try:
+        return analyse_position(move_sequence, depth, time_budget, node_budget, seed)
+    except ValueError as error:
+        return {"error": str(error)}
+
+
+def analyse(positions, depth=None, time_budget=None, node_budget=None, n_workers=None, seed=0,
+            max_pending=None):
+    """ analyse (id, move_sequence) pairs in worker processes, yields (id, result) in order of
+    completion. the result is the dict of analyse_position, or {"error": message} for an
+    invalid position. at most max_pending positions (4 per worker by default) are handed to
+    the workers at a time, so positions can be read lazily from a large file """
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        if max_pending is None:
+            max_pending = 4 * (n_workers or os.cpu_count() or 1)
+        positions = iter(positions)
+        pending = {}
+        while True:
+            for position_id, move_sequence in positions:
+                future = executor.submit(_analyse_or_error, list(move_sequence), depth, time_budget,
+                                         node_budget, "%s:%s" % (seed, position_id))
+                pending[future] = position_id
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+
+def read_positions(lines):
+    """ (id, moves) of lines "id move move ...", empty lines and lines starting with # are skipped """
+    for line in lines:
+        fields = line.split()
+        if fields and not fields[0].startswith("#"):
+            yield fields[0], fields[1:]
+
+
+def game_log_positions(path):
+    """ (game:ply, move_sequence) of all positions of the games in a game log before each move """
+    with GameLogReader(path) as reader:
+        for i, (move_sequence, _) in enumerate(reader):
+            for ply in range(len(move_sequence)):
+                yield "%d:%d" % (i, ply), move_sequence[:ply]
+
+
+def _print_results(positions, args):
+    for position_id, result in analyse(positions, args.depth, args.time, args.nodes,
+                                       args.workers, args.seed):
+        print(json.dumps(dict(result, id=position_id)), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="analyse quantik positions in worker processes")
+    parser.add_argument("positions", nargs="?", help="file with one position per line, stdin by default")
+    parser.add_argument("--game-log", help="analyse all positions of the games in this game log")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--depth", type=int, help="search depth (5 without any budget)")
+    budget.add_argument("--time", type=float, help="seconds per position")
+    budget.add_argument("--nodes", type=int, help="searched positions per position")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.positions and args.game_log:
+        parser.error("give either a positions file or --game-log")
+
+    if args.positions:
+        with open(args.positions) as f:
+            _print_results(read_positions(f), args)
+    elif args.game_log:
+        _print_results(game_log_positions(args.game_log), args)
+    else:
+        _print_results(read_positions(sys.stdin), args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
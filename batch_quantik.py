@@ -0,0 +1,114 @@
+import numpy as np
+from game_quantik import TOKENS, FIELDS, FIELD_INDEX, INFLUENCE_MASKS, QuantikBoard
+"""
+many quantik games played at once with numpy, one ply of all games per step.
+a move is coded as shape index * 16 + field index (shapes in order of TOKENS, fields as in
+QuantikBoard.fields), players as 0 for w and 1 for b.
+policies give a score to every move of every game, the legal move with highest score is played.
+"""
+PLAYERS = ("w", "b")
+N_MOVES = len(TOKENS) * len(FIELDS)
+# per space (in order of QuantikBoard.spaces) the indices of its four fields
+SPACE_FIELDS = np.array([[FIELD_INDEX[f] for f in space] for space in QuantikBoard().spaces])
+# per field and space, whether the field is in the space
+FIELD_IN_SPACE = np.zeros((len(FIELDS), len(SPACE_FIELDS)), dtype=bool)
+for _k, _space in enumerate(SPACE_FIELDS):
+    FIELD_IN_SPACE[_space, _k] = True
+# per field, the fields in the same row, column or square
+INFLUENCE = np.array([[m >> i & 1 for i in range(16)] for m in INFLUENCE_MASKS], dtype=bool)
+
+
+def random_policy(batch, legal, rng):
+    """ random legal move, shapes weighted by number of tokens left as in QuantikAI.random_move,
+    sampled by adding gumbel noise to the log weights """
+    with np.errstate(divide="ignore"):
+        log_weights = np.log(np.repeat(batch.left[:, batch.player], len(FIELDS), axis=1))
+    return log_weights + rng.gumbel(size=legal.shape)
+
+
+def greedy_policy(batch, legal, rng):
+    """ a winning move if there is one, else random """
+    return random_policy(batch, legal, rng) + 1000 * batch.winning_moves()
+
+
+POLICIES = {"random": random_policy, "greedy": greedy_policy}
+
+
+class BatchQuantik():
+    """ state of n_games games as numpy arrays, all games are at the same ply """
+
+    def __init__(self, n_games, seed=None):
+        self.n_games = n_games
+        self.rng = np.random.default_rng(seed)
+        # per game and field, one hot of the shape placed on the field (any player)
+        self.shapes = np.zeros((n_games, len(FIELDS), len(TOKENS)), dtype=bool)
+        self.free = np.ones((n_games, len(FIELDS)), dtype=bool)
+        # per game, player and shape, fields where the player may not place the shape
+        self.forbidden = np.zeros((n_games, 2, len(TOKENS), len(FIELDS)), dtype=bool)
+        # per game, player and shape, number of tokens left
+        self.left = np.full((n_games, 2, len(TOKENS)), 2, dtype=np.int8)
+        # player to move, same for all games
+        self.player = 0
+        self.ply = 0
+        # winner per game: -1 game running, 0 w, 1 b, 2 draw
+        self.winner = np.full(n_games, -1, dtype=np.int8)
+        # moves played per game, -1 after the end of the game
+        self.moves = np.full((n_games, len(FIELDS)), -1, dtype=np.int8)
+
+    def legal_moves(self):
+        """ (n_games, 64) mask of the moves the player to move can make """
+        legal = (self.free[:, None, :] & ~self.forbidden[:, self.player]
+                 & (self.left[:, self.player] > 0)[:, :, None])
+        return legal.reshape(self.n_games, N_MOVES)
+
+    def winning_moves(self):
+        """ (n_games, 64) mask of moves that would complete a space, i.e. a space with the
+        three other shapes present. legality is not checked """
+        present = self.shapes[:, SPACE_FIELDS].any(axis=2)
+        completing = (present.sum(axis=2) == 3)[:, :, None] & ~present
+        wins = np.einsum("nks,fk->nsf", completing.astype(np.int8), FIELD_IN_SPACE.astype(np.int8)) > 0
+        return (wins & self.free[:, None, :]).reshape(self.n_games, N_MOVES)
+
+    def space_is_complete(self):
+        """ per game, whether any of the 12 spaces has all four shapes """
+        return self.shapes[:, SPACE_FIELDS].any(axis=2).all(axis=2).any(axis=1)
+
+    def step(self, policy):
+        """ play one ply in all running games, policy is a name in POLICIES or a function
+        (batch, legal, rng) -> scores of shape (n_games, 64) """
+        if isinstance(policy, str):
+            policy = POLICIES[policy]
+        running = self.winner < 0
+        legal = self.legal_moves()
+        # the player to move cannot move, as in QuantikAI this is a draw
+        blocked = running & ~legal.any(axis=1)
+        self.winner[blocked] = 2
+        running &= ~blocked
+        games = np.flatnonzero(running)
+        if len(games):
+            scores = np.where(legal, policy(self, legal, self.rng), -np.inf)
+            move = scores.argmax(axis=1)[games]
+            shape, field = move // len(FIELDS), move % len(FIELDS)
+            self.shapes[games, field, shape] = True
+            self.free[games, field] = False
+            self.forbidden[games, 1 - self.player, shape] |= INFLUENCE[field]
+            self.left[games, self.player, shape] -= 1
+            self.moves[games, self.ply] = move
+            won = games[self.space_is_complete()[games]]
+            self.winner[won] = self.player
+        self.player = 1 - self.player
+        self.ply += 1
+        return self
+
+    def play(self, policy_w="random", policy_b="random"):
+        """ play all games to the end, returns winners ("w", "b" or "draw") and moves """
+        policies = (policy_w, policy_b)
+        while (self.winner < 0).any():
+            self.step(policies[self.player])
+        return np.array(PLAYERS + ("draw",))[self.winner], self.moves
+
+
+def move_sequences(moves):
+    """ move codes as returned by BatchQuantik.play, as lists like QuantikBoard.move_sequence """
+    return [[(FIELDS[m % len(FIELDS)], TOKENS[m // len(FIELDS)]) for m in game if m >= 0]
+            for game in moves.tolist()]
@@ -0,0 +1,273 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from functools import partial
+from game_quantik import QuantikAI
+"""
+micro benchmarks of the board and search hot paths on fixed, seeded positions of the early,
+mid and late game: get_possible_moves, make_move and revert_last_move pairs, game_is_won,
+reduce_possible_moves and a full minimax_move (on positions without an immediate win). reports operations per second (best of --repeat
+runs) and memory measured with tracemalloc: the peak memory of an operation (mean and maximum
+over the operations, see peak_memory), which also counts memory freed within the operation, and
+the blocks and bytes an operation leaves allocated, its result included (retained_allocations).
+engines of minimax_move are created outside the timed runs. results can be saved as json and compared
+against a saved baseline: a benchmark regresses if it is slower by more than the threshold
+(relative, e.g. 0.1 for 10%), thresholds can be set per benchmark.
+
+usage: python bench_quantik.py [--json bench.json] [--baseline baseline.json] [--threshold 0.1]
+                               [--threshold minimax_move/late=0.25]
+"""
+# phase -> number of moves played before the position
+PHASES = {"early": 3, "mid": 5, "late": 7}
+POSITIONS_PER_PHASE = 8
+# positions per phase searched by the minimax_move benchmark, a full search is slow in the early game
+MINIMAX_POSITIONS_PER_PHASE = 2
+# benchmarks run on positions without an immediate win, the search would stop at the winning move
+SEARCH_BENCHMARKS = {"minimax_move"}
+
+
+def seeded_positions(n_moves, n_positions, seed=0, skip_immediate_wins=False):
+    """ boards after n_moves random moves, from a private random generator so the positions do
+    not depend on the engine. games that end before are skipped, with skip_immediate_wins also
+    positions where the player to move can win at once """
+    rng = random.Random("%d:%d" % (seed, n_moves))
+    boards = []
+    while len(boards) < n_positions:
+        board = QuantikAI(verbose_output=False)
+        for _ in range(n_moves):
+            pos_moves = sorted(board.get_possible_moves())
+            if board.winner or not pos_moves:
+                break
+            board.make_move(rng.choice(pos_moves))
+        pos_moves = board.get_possible_moves()
+        if board.winner or not pos_moves:
+            continue
+        if skip_immediate_wins and board.winning_moves() & set(pos_moves):
+            continue
+        boards.append(board)
+    return boards
+
+
+def _bench_get_possible_moves(boards):
+    def run():
+        return [board.get_possible_moves() for board in boards]
+    return run, [board.get_possible_moves for board in boards], None
+
+
+def _bench_make_revert(boards):
+    moves = [(board, sorted(board.get_possible_moves())) for board in boards]
+
+    def run():
+        for board, pos_moves in moves:
+            for move in pos_moves:
+                board.make_move(move)
+                board.revert_last_move()
+
+    def make_revert(board, move):
+        board.make_move(move)
+        board.revert_last_move()
+    return run, [partial(make_revert, board, move) for board, pos_moves in moves for move in pos_moves], None
+
+
+def _bench_game_is_won(boards):
+    def run():
+        return [board.game_is_won() for board in boards]
+    return run, [board.game_is_won for board in boards], None
+
+
+def _bench_reduce_possible_moves(boards):
+    moves = [(board, sorted(board.get_possible_moves())) for board in boards]
+
+    def run():
+        return [board.reduce_possible_moves(pos_moves) for board, pos_moves in moves]
+    return run, [partial(board.reduce_possible_moves, pos_moves) for board, pos_moves in moves], None
+
+
+def _bench_minimax_move(boards):
+    sequences = [list(board.move_sequence) for board in boards]
+    # fresh engines for each run, created by setup outside of the timed run
+    engines = []
+
+    def setup():
+        engines.clear()
+        for move_sequence in sequences:
+            ai = QuantikAI(verbose_output=False)
+            for move in move_sequence:
+                ai.make_move(move)
+            engines.append(ai)
+
+    def search(i):
+        random.seed(i)
+        engines[i].minimax_move()
+
+    def run():
+        for i in range(len(engines)):
+            search(i)
+    return run, [partial(search, i) for i in range(len(sequences))], setup
+
+
+BENCHMARKS = {"get_possible_moves": _bench_get_possible_moves,
+              "make_revert": _bench_make_revert,
+              "game_is_won": _bench_game_is_won,
+              "reduce_possible_moves": _bench_reduce_possible_moves,
+              "minimax_move": _bench_minimax_move,
+              }
+
+
+def _time_runs(run, setup, loops):
+    """ seconds of loops calls of run, setup is called before each call and not timed """
+    if setup is None:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        return time.perf_counter() - start
+    seconds = 0.0
+    for _ in range(loops):
+        setup()
+        start = time.perf_counter()
+        run()
+        seconds += time.perf_counter() - start
+    return seconds
+
+
+def peak_memory(ops, setup=None):
+    """ per op, the peak of memory traced by tracemalloc while the op runs, above the memory
+    traced before it. this includes memory freed within the op, e.g. history entries of
+    make_move released by revert_last_move, and the result of the op """
+    if setup is not None:
+        setup()
+    peaks = []
+    tracemalloc.start()
+    try:
+        for op in ops:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = op()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            del result
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def retained_allocations(ops, setup=None):
+    """ blocks and bytes allocated by the ops and still allocated after all of them, with their
+    results kept, from tracemalloc snapshots. unlike peak_memory, memory freed within an op is
+    not counted """
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        results = [op() for op in ops]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del results
+    # without the allocations of tracemalloc itself, e.g. the first snapshot
+    exclude = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(exclude).compare_to(before.filter_traces(exclude), "filename")
+    return sum(s.count_diff for s in diff), sum(s.size_diff for s in diff)
+
+
+def measure(run, ops, setup, repeat, loops):
+    """ ops per second (best of repeat runs of loops calls), peak memory and retained
+    allocations per op """
+    n_ops = len(ops)
+    best = min(_time_runs(run, setup, loops) for _ in range(repeat))
+    peaks = peak_memory(ops, setup)
+    blocks, size = retained_allocations(ops, setup)
+    return {"ops": n_ops * loops, "seconds": best, "ops_per_second": n_ops * loops / best,
+            "peak_bytes_per_op": sum(peaks) / n_ops, "max_peak_bytes": max(peaks),
+            "blocks_per_op": blocks / n_ops, "bytes_per_op": size / n_ops}
+
+
+def run_benchmarks(names=None, repeat=5, seed=0, min_seconds=0.05):
+    """ results per benchmark name, e.g. "get_possible_moves/mid" """
+    results = {}
+    for phase, n_moves in PHASES.items():
+        boards = seeded_positions(n_moves, POSITIONS_PER_PHASE, seed)
+        search_boards = seeded_positions(n_moves, MINIMAX_POSITIONS_PER_PHASE, seed, skip_immediate_wins=True)
+        for name, bench in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            run, ops, setup = bench(search_boards if name in SEARCH_BENCHMARKS else boards)
+            # calls per timed run, so that a run takes at least min_seconds
+            seconds = _time_runs(run, setup, 1)
+            loops = max(1, int(min_seconds / max(seconds, 1e-9)))
+            results["%s/%s" % (name, phase)] = measure(run, ops, setup, repeat, loops)
+    return results
+
+
+def compare(results, baseline, threshold=0.1, thresholds=None):
+    """ per benchmark in both, the relative change of ops per second (negative is slower)
+    and whether it is a regression beyond its threshold """
+    comparison = {}
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = result["ops_per_second"] / baseline[name]["ops_per_second"] - 1
+        limit = (thresholds or {}).get(name, (thresholds or {}).get(name.split("/")[0], threshold))
+        comparison[name] = {"change": change, "threshold": limit, "regression": change < -limit}
+    return comparison
+
+
+def _parse_thresholds(values, parser):
+    """ global threshold and per benchmark thresholds from --threshold values """
+    threshold, thresholds = 0.1, {}
+    for value in values:
+        name, _, limit = value.rpartition("=")
+        try:
+            if name:
+                thresholds[name] = float(limit)
+            else:
+                threshold = float(limit)
+        except ValueError:
+            parser.error("invalid threshold %r" % value)
+    return threshold, thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="micro benchmarks of the quantik engine")
+    parser.add_argument("--json", help="write the results as json to this path")
+    parser.add_argument("--baseline", help="json of an earlier run to compare with")
+    parser.add_argument("--threshold", action="append", default=[],
+                        help="allowed relative slowdown, for all benchmarks (0.1) or as name=0.2 "
+                             "for one benchmark (e.g. minimax_move or minimax_move/late)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark, the best counts")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the positions")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="run only these benchmarks")
+    args = parser.parse_args(argv)
+    threshold, thresholds = _parse_thresholds(args.threshold, parser)
+
+    results = run_benchmarks(args.only, args.repeat, args.seed)
+    report = {"python": platform.python_version(), "seed": args.seed, "benchmarks": results}
+    comparison = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("seed") != args.seed:
+            parser.error("baseline was run with seed %s" % baseline.get("seed"))
+        comparison = compare(results, baseline["benchmarks"], threshold, thresholds)
+        report["comparison"] = comparison
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+    for name, r in results.items():
+        line = "%-30s %12.0f ops/s  peak %9.0f bytes/op  max %9.0f bytes  %7.1f blocks/op" % (
+            name, r["ops_per_second"], r["peak_bytes_per_op"], r["max_peak_bytes"], r["blocks_per_op"])
+        if comparison and name in comparison:
+            c = comparison[name]
+            line += "  %+6.1f%%%s" % (100 * c["change"], "  REGRESSION" if c["regression"] else "")
+        print(line)
+    if comparison and any(c["regression"] for c in comparison.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+"""
+startup benchmark for engine worker processes: spawns fresh interpreters that import the engine,
+play one random game without output and report import time, time to first finished game and
+peak memory (resident set size). with --with-plotting, the workers also import plot_quantik,
+as every worker did when matplotlib was imported by game_quantik.
+
+usage: python bench_startup_quantik.py --workers 8 [--with-plotting] [--json startup.json]
+"""
+
+
+def _worker(with_plotting):
+    import resource
+    start = time.perf_counter()
+    from game_quantik import QuantikAI
+    if with_plotting:
+        import plot_quantik
+    imported = time.perf_counter()
+    QuantikAI(verbose_output=False).play_one_round("random", "random", print_out=False)
+    played = time.perf_counter()
+    return {"import_seconds": imported - start,
+            "first_game_seconds": played - start,
+            "plotting_loaded": "matplotlib" in sys.modules,
+            # kilobytes on linux
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="startup time and memory of engine worker processes")
+    parser.add_argument("--workers", type=int, default=4, help="number of worker processes to spawn")
+    parser.add_argument("--with-plotting", action="store_true", help="also import the plotting module")
+    parser.add_argument("--json", help="write the per worker results as json to this path")
+    args = parser.parse_args(argv)
+
+    # spawn starts a fresh interpreter, as on systems without fork
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with context.Pool(args.workers) as pool:
+        results = pool.map(_worker, [args.with_plotting] * args.workers)
+    wall_seconds = time.perf_counter() - start
+    summary = {"workers": args.workers, "with_plotting": args.with_plotting,
+               "wall_seconds": wall_seconds,
+               "mean_import_seconds": sum(r["import_seconds"] for r in results) / len(results),
+               "mean_first_game_seconds": sum(r["first_game_seconds"] for r in results) / len(results),
+               "max_rss_kb": max(r["max_rss_kb"] for r in results),
+               "plotting_loaded": any(r["plotting_loaded"] for r in results)}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(summary, per_worker=results), f, indent=1)
+    for key, value in summary.items():
+        print("%-24s %s" % (key, value))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
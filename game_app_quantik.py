@@ -2,11 +2,21 @@ import pygame
 from pygame.locals import *
 from pygame import Vector2
 import random
+import threading
+import time
 
 from game_quantik import QuantikAI 
+from symmetry_quantik import equivalent_moves, apply_symmetry
 
 # AI player method, name from QuantikAI class
 AI_METHOD = "minimax"
+# seconds the AI may think per move, None for the fixed depth search
+AI_TIME_BUDGET = 2.0
+# minimum seconds from the human move until the AI move is shown, None to show it immediately
+AI_MIN_MOVE_TIME = 0.5
+# number of likely human moves for which the AI searches its reply while the human is thinking
+PONDER_MOVES = 8
+FRAMES_PER_SECOND = 30
 
 SIZE = 800, 500
 # ======= DEFINE VISUALS: COLOR, SHAPES, FONT ======
@@ -105,6 +115,96 @@ def get_rect_center(rect):
     """get the center coordinates of a rectangle"""
     return Vector2(rect[0]+0.5*rect[2], rect[1]+0.5*rect[3])
 
+class BackgroundAI():
+    """ the AI player, searching in a background thread so that the window keeps responding.
+    while the human is to move, the AI ponders the most likely human moves and caches its
+    replies, a cached reply is played without search """
+
+    def __init__(self, method, time_budget, ponder_moves=PONDER_MOVES):
+        self.method = method
+        self.time_budget = time_budget
+        self.ponder_moves = ponder_moves
+        # own game instance of the thread, the transposition table is kept for the whole game
+        self.engine = QuantikAI(verbose_output=False)
+        self.engine.cancel_event = threading.Event()
+        # AI move per position (tuple of moves played so far), found by search or pondering
+        self.replies = {}
+        # AI move of the running start_move, None until found
+        self.result = None
+        self._thread = None
+
+    def _run_in_background(self, target, move_sequence):
+        self.cancel()
+        self._thread = threading.Thread(target=target, args=(tuple(move_sequence),), daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """ stop the running search or pondering and wait for the thread to finish """
+        if self._thread is not None:
+            self.engine.cancel_event.set()
+            self._thread.join()
+            self.engine.cancel_event.clear()
+            self._thread = None
+
+    def start_move(self, move_sequence):
+        """ start the search of the AI move after move_sequence, poll result for the move """
+        self.result = None
+        self.cancel()
+        if tuple(move_sequence) in self.replies:
+            self.result = self.replies[tuple(move_sequence)]
+        else:
+            self._run_in_background(self._search_move, move_sequence)
+
+    def start_pondering(self, move_sequence):
+        """ search replies to likely human moves after move_sequence until the human moves """
+        self._run_in_background(self._ponder, move_sequence)
+
+    def _sync_engine(self, move_sequence):
+        """ bring the engine to the position after move_sequence by reverting and making moves """
+        engine = self.engine
+        n_common = 0
+        while (n_common < min(len(engine.move_sequence), len(move_sequence))
+               and engine.move_sequence[n_common] == move_sequence[n_common]):
+            n_common += 1
+        while len(engine.move_sequence) > n_common:
+            engine.revert_last_move()
+        for move in move_sequence[n_common:]:
+            engine.make_move(move)
+
+    def _reply(self, move_sequence):
+        """ AI move after move_sequence, None if the game is over there """
+        self._sync_engine(move_sequence)
+        engine = self.engine
+        if engine.winner or not engine.get_possible_moves():
+            return None
+        engine.make_AI_move(method=self.method, time_budget=self.time_budget)
+        move = engine.move_sequence[-1]
+        engine.revert_last_move()
+        return move
+
+    def _search_move(self, move_sequence):
+        move = self._reply(move_sequence)
+        if not self.engine.cancel_event.is_set():
+            self.replies[move_sequence] = move
+            self.result = move
+
+    def _ponder(self, move_sequence):
+        self._sync_engine(move_sequence)
+        engine = self.engine
+        pos_moves = engine.reduce_possible_moves(engine.get_possible_moves(shuffle=True))
+        pos_moves = engine.order_moves(pos_moves, depth=None)[:self.ponder_moves]
+        # each pondered move stands for its class of equivalent moves, the reply is cached
+        # for all of them, mapped by the symmetry from the pondered move to the equivalent one
+        equivalents = {move: equivalent_moves(engine, move) for move in pos_moves}
+        for move in pos_moves:
+            reply = self._reply(move_sequence + (move,))
+            if engine.cancel_event.is_set():
+                return
+            if reply is not None:
+                for equivalent, symmetry in equivalents[move].items():
+                    self.replies[move_sequence + (equivalent,)] = apply_symmetry(symmetry, reply)
+
+
 # TODO:
 def update_banner(stage, game_inst=None):
     if game_inst and game_inst.winner:
@@ -162,17 +262,22 @@ for r in FIELDS:
 
 pygame.display.flip()
 running = True
+clock = pygame.time.Clock()
 f_select = None 
 picked_token = None
 
 player_choice = None
 player_color_map = {'w': COLORS['white_tokens'], 'b': COLORS['black_tokens']}
 ai_color_map = {'w': COLORS['black_tokens'], 'b': COLORS['white_tokens']}
+ai_player = None
+# time the current AI turn started, None while it is not the turn of the AI
+ai_turn_start = None
 update_banner("entry")
 while running:
     
     if player_choice and q_game.winner:
         player_choice = None
+        ai_player.cancel()
 
     for event in pygame.event.get():
         if event.type == QUIT:
@@ -185,6 +290,7 @@ while running:
                 if r:
                     # reset game class and visuals to start of new round
                     q_game = QuantikAI()
+                    ai_player = BackgroundAI(AI_METHOD, AI_TIME_BUDGET)
                     left_tokens = list(zip(['C', 'S', 'T', 'H', 'C', 'S', 'T', 'H'], LEFT_TOKEN_AREAS))
                     #pygame.draw.rect(screen, COLORS['selection_frame'], Rect(r), width=2)
                     for t, r in left_tokens:
@@ -197,19 +303,11 @@ while running:
                         update_banner("ai turn")
                     else: 
                         update_banner("your turn")
-            
+                        ai_player.start_pondering(q_game.move_sequence)
 
         elif q_game.player != player_choice:
-            # turn of the ai to play
-            pygame.time.delay(500)
-            q_game.make_AI_move(method=AI_METHOD)
-            # get the field and token of ai move and draw it
-            ai_move_field, ai_move_token = q_game.move_sequence[-1]
-            field_idx = q_game.fields.index(ai_move_field)
-            field_center_coordinates = get_rect_center(FIELDS[field_idx])
-            draw_token(screen, ai_color_map[player_choice], ai_move_token, field_center_coordinates)
-            #pygame.draw.rect(screen, COLORS['background'], Rect(NOTIF_BANNER))
-            update_banner("your turn", game_inst=q_game)
+            # the AI is searching, clicks are ignored
+            pass
 
         elif event.type == MOUSEBUTTONDOWN:
             update_banner("your turn")
@@ -239,8 +337,32 @@ while running:
                 picked_token = kind
                 picked_token_r = r
                 picked_token_enum = enum     
+
+    if running and player_choice and not q_game.winner and q_game.player != player_choice:
+        # turn of the ai to play, the search runs in the background and is polled every frame
+        if ai_turn_start is None:
+            if not q_game.get_possible_moves():
+                q_game.make_AI_move(method=AI_METHOD)
+            else:
+                ai_turn_start = time.perf_counter()
+                ai_player.start_move(q_game.move_sequence)
+        elif (ai_player.result is not None and
+              (AI_MIN_MOVE_TIME is None or time.perf_counter() - ai_turn_start >= AI_MIN_MOVE_TIME)):
+            ai_turn_start = None
+            q_game.make_move(ai_player.result)
+            # get the field and token of ai move and draw it
+            ai_move_field, ai_move_token = q_game.move_sequence[-1]
+            field_idx = q_game.fields.index(ai_move_field)
+            field_center_coordinates = get_rect_center(FIELDS[field_idx])
+            draw_token(screen, ai_color_map[player_choice], ai_move_token, field_center_coordinates)
+            #pygame.draw.rect(screen, COLORS['background'], Rect(NOTIF_BANNER))
+            update_banner("your turn", game_inst=q_game)
+            if not q_game.winner:
+                ai_player.start_pondering(q_game.move_sequence)
       
     pygame.display.flip()
-    
-pygame.quit()
+    clock.tick(FRAMES_PER_SECOND)
 
+if ai_player:
+    ai_player.cancel()
+pygame.quit()
@@ -1,125 +1,361 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import colors
-from itertools import product, chain
+from itertools import product, zip_longest
 import random
 import math 
+import json
+import time
+from symmetry_quantik import reduce_moves
+from mcts_quantik import MCTSTree
+from tablebase_quantik import Tablebase, LOSS, OUTCOME_BEFORE_MOVE, outcome_score
 """
 terminology: 
 w,b for player black, white
+fields are enumerated row by row, field (x,y) has index 4*x+y and bit 1<<(4*x+y)
+in the 16 bit masks of the bitboard state
 """
+TOKENS = ("C", "H", "S", "T")
+FIELDS = tuple(product(range(4), range(4)))
+FIELD_INDEX = {f: i for i, f in enumerate(FIELDS)}
+FULL_MASK = (1 << 16) - 1
+OPPONENT = {"w": "b", "b": "w"}
+# methods of QuantikAI.make_AI_move
+AI_METHODS = ("random", "minimax", "minimax_parallel", "mcts")
+
+
+def _influence_fields(field):
+    """ get all fields which are in the same row, column or square as field"""
+    x, y = field
+    line = [(i, y) for i in range(4) if i != x]
+    column = [(x, i) for i in range(4) if i != y]
+    a = x + (1 - (x%2)*2)
+    b = y + (1 - (y%2)*2)
+    square = [(x,b), (a,y), (a,b)]
+    return line+column+square
+
+
+def fields_to_mask(fields):
+    mask = 0
+    for f in fields:
+        mask |= 1 << FIELD_INDEX[f]
+    return mask
+
+
+def mask_to_fields(mask):
+    """ fields of all set bits of mask, in field enumeration order """
+    fields = []
+    while mask:
+        low_bit = mask & -mask
+        fields.append(FIELDS[low_bit.bit_length() - 1])
+        mask ^= low_bit
+    return fields
+
+
+def format_move(move):
+    """ short notation of a move, e.g. ((1, 2), "T") as "12T" """
+    (x, y), token = move
+    return "%d%d%s" % (x, y, token)
+
+
+def parse_move(text):
+    """ move from the notation of format_move """
+    x, y, token = text.strip()
+    if x not in "0123" or y not in "0123" or token not in TOKENS:
+        raise ValueError("invalid move %r" % text)
+    return (int(x), int(y)), token
+
+
+def encode_move(move):
+    """ move as one byte: shape index (in order of TOKENS) * 16 + field index """
+    field, token = move
+    return TOKENS.index(token) << 4 | FIELD_INDEX[field]
+
+
+def decode_move(code):
+    """ move from the byte of encode_move """
+    return FIELDS[code & 15], TOKENS[code >> 4]
+
+
+# per field index, mask of the fields sharing a row, column or square with it
+INFLUENCE_MASKS = tuple(fields_to_mask(_influence_fields(f)) for f in FIELDS)
+
+# columns, rows and squares are called spaces
+SPACES = ([[(x,y) for x in range(4)] for y in range(4)]
+          + [[(y,x) for x in range(4)] for y in range(4)]
+          + [[(y,x) for x in range(0,2) for y in range(0,2)]]
+          + [[(y,x) for x in range(2,4) for y in range(0,2)]]
+          + [[(y,x) for x in range(2,4) for y in range(2,4)]]
+          + [[(y,x) for x in range(0,2) for y in range(2,4)]]
+          )
+SPACE_MASKS = tuple(fields_to_mask(space) for space in SPACES)
+# per field index, the indices of the three spaces containing the field
+FIELD_SPACES = tuple(tuple(k for k, space in enumerate(SPACES) if f in space) for f in FIELDS)
+FIELD_SPACEINDEX_MAP = dict(zip(FIELDS, FIELD_SPACES))
+# shapes present in a space as bit mask, a space with all four shapes wins
+SHAPE_BITS = {s: 1 << i for i, s in enumerate(TOKENS)}
+ALL_SHAPES = (1 << len(TOKENS)) - 1
+# for the masks of three shapes, the missing shape
+MISSING_SHAPE = {ALL_SHAPES ^ bit: s for s, bit in SHAPE_BITS.items()}
+
+# per player, shape and field index a random 64 bit key, the zobrist key of a position
+# is the xor of the keys of all placed tokens (fixed seed, so keys are the same in every process)
+_zobrist_rng = random.Random(4321)
+ZOBRIST_KEYS = {p: {s: tuple(_zobrist_rng.getrandbits(64) for _ in range(16)) for s in TOKENS}
+                for p in ("w", "b")}
+
+# bound types of transposition table entries
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+class TranspositionTable():
+    """ table of search results keyed by zobrist key, with a fixed number of slots.
+    an entry is (key, depth, bound, value, generation), depth is the remaining search
+    depth below the position and value is from view of the player to move """
+
+    def __init__(self, max_entries=2**18):
+        self.max_entries = max_entries
+        self.entries = [None] * max_entries
+        # incremented for each new search, entries of older searches are replaced first
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * self.max_entries
+
+    def lookup(self, key):
+        entry = self.entries[key % self.max_entries]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, value):
+        """ store unless the slot holds a deeper search result of the current search """
+        slot = key % self.max_entries
+        entry = self.entries[slot]
+        if (entry is None or entry[0] == key or entry[4] != self.generation
+                or depth >= entry[1]):
+            self.entries[slot] = (key, depth, bound, value, self.generation)
+
+
+class SearchStats():
+    """ statistics of one search of minimax_move. nodes of negamax are counted per depth of the
+    node, the positions after the root moves have depth 0. with parallel search, the statistics
+    of the worker processes are added """
+
+    def __init__(self):
+        self.nodes_per_depth = {}
+        # positions visited by solve_endgame, the one it is called on included
+        self.endgame_nodes = 0
+        # cutoffs at nodes of the searching player (value >= beta) and of the opponent (value <= alpha)
+        self.beta_cutoffs = 0
+        self.alpha_cutoffs = 0
+        # null window searches that found a better move and were searched again with the full window
+        self.re_searches = 0
+        # positions whose value (or a cutoff) was taken from the transposition table
+        self.tt_hits = 0
+        # moves before and after reduce_possible_moves, at nodes that were expanded
+        self.moves_generated = 0
+        self.moves_after_reduction = 0
+        self.expanded_nodes = 0
+        self.children_searched = 0
+        # per completed iteration of iterative deepening: depth, nodes, seconds, best move, value
+        # and principal variation
+        self.iterations = []
+        self.wall_time = None
+        self.move = None
+
+    @property
+    def nodes(self):
+        return sum(self.nodes_per_depth.values()) + self.endgame_nodes
+
+    @property
+    def reduction_ratio(self):
+        """ share of generated moves that remain after symmetry reduction """
+        return self.moves_after_reduction / self.moves_generated if self.moves_generated else None
+
+    @property
+    def branching_factor(self):
+        """ mean number of children searched per expanded node """
+        return self.children_searched / self.expanded_nodes if self.expanded_nodes else None
+
+    def add(self, other):
+        """ add the counts of other, a search of other root moves at the same depths """
+        for depth, n_nodes in other.nodes_per_depth.items():
+            self.nodes_per_depth[depth] = self.nodes_per_depth.get(depth, 0) + n_nodes
+        self.endgame_nodes += other.endgame_nodes
+        self.beta_cutoffs += other.beta_cutoffs
+        self.alpha_cutoffs += other.alpha_cutoffs
+        self.re_searches += other.re_searches
+        self.tt_hits += other.tt_hits
+        self.moves_generated += other.moves_generated
+        self.moves_after_reduction += other.moves_after_reduction
+        self.expanded_nodes += other.expanded_nodes
+        self.children_searched += other.children_searched
+
+    def to_dict(self):
+        return {"nodes": self.nodes, "nodes_per_depth": self.nodes_per_depth,
+                "endgame_nodes": self.endgame_nodes,
+                "beta_cutoffs": self.beta_cutoffs, "alpha_cutoffs": self.alpha_cutoffs,
+                "re_searches": self.re_searches,
+                "tt_hits": self.tt_hits, "reduction_ratio": self.reduction_ratio,
+                "branching_factor": self.branching_factor, "iterations": self.iterations,
+                "wall_time": self.wall_time,
+                "move": None if self.move is None else format_move(self.move)}
+
+
 class QuantikBoard():
     name = "quantik"
 
     def __init__(self, verbose_output=True):
         self.verbose = verbose_output
         # names for different shapes of tokens
-        self.tokens = ["C", "H", "S", "T"]
+        self.tokens = list(TOKENS)
         # list of fields on board
-        self.fields = tuple(product(range(4), range(4)))
+        self.fields = FIELDS
         # columns, rows and squares are called spaces
-        self.spaces = ([[(x,y) for x in range(4)] for y in range(4)]
-                        + [[(y,x) for x in range(4)] for y in range(4)]
-                        + [[(y,x) for x in range(0,2) for y in range(0,2)]]
-                        + [[(y,x) for x in range(2,4) for y in range(0,2)]]
-                        + [[(y,x) for x in range(2,4) for y in range(2,4)]]
-                        + [[(y,x) for x in range(0,2) for y in range(2,4)]]
-                        )
+        self.spaces = SPACES
         # for each field, the indices of the spaces that intersect with the field
-        self.field_spaceindex_map = {f: self._get_spaces_of_field_as_index(f) for f in self.fields}
-        # list of played tokens on board, only used for matplot print
-        self.placed = {"w": {s: [] for s in self.tokens},
-                        "b": {s: [] for s in self.tokens},   
-                        } 
-        self.free_fields = list(product(range(4), range(4)))
-        # per player and shape, list of fields where player is forbidden to put a token of shape
-        self.forbidden = {"w": {s: [] for s in self.tokens},
-                        "b": {s: [] for s in self.tokens},   
-                        }
-        # the tokens left to play
-        self.left_pieces = {"w": self.tokens*2,
-                       "b": self.tokens*2,   
-                       }
+        self.field_spaceindex_map = FIELD_SPACEINDEX_MAP
+        # bitboard state: per player and shape, mask of fields where the player placed a token of shape
+        self.shape_masks = {"w": {s: 0 for s in self.tokens},
+                            "b": {s: 0 for s in self.tokens},
+                            }
+        # mask of fields not yet occupied
+        self.free_mask = FULL_MASK
+        # per player, mask of fields with a token of the player, used as index of the
+        # symmetries that keep the occupied fields in place (see symmetry_quantik.py)
+        self.player_masks = {"w": 0, "b": 0}
+        # per player and shape, mask of fields where player is forbidden to put a token of shape
+        self.forbidden_masks = {"w": {s: 0 for s in self.tokens},
+                                "b": {s: 0 for s in self.tokens},
+                                }
+        # per player and shape, number of tokens left to play
+        self.left_counts = {"w": {s: 2 for s in self.tokens},
+                            "b": {s: 2 for s in self.tokens},
+                            }
+        # forbidden masks before each move, to restore them on revert
+        self._forbidden_history = []
+        # zobrist key of the position, updated with each move
+        self.zobrist_key = 0
         # player of current turn
         self.player = "w"
         # sequence of moves
         self.move_sequence = []
-        # for each space (by index in self.spaces) a list of shapes of tokens present
-        # underscore stands for no token
+        # for each space a mask of the shapes present (SHAPE_BITS),
         # serve to determine win, i.e. all four shapes present in a space
-        self.tokens_in_spaces = [['_','_','_','_'] for x in range(12)]
+        self.space_shape_masks = [0] * len(SPACES)
+        # masks of the spaces of the field of each move before the move, to restore them on revert
+        self._space_mask_history = []
         # winner of the game, None until game finished
         self.winner = None
-        # matrix of counts of overlapping spaces between the two fields indicated by row and colum index
-        self.pairwise_space_overlap = self._get_pairwise_space_overlap()
-
-    def _get_pairwise_space_overlap(self):
-        """ create a matrix of counts of overlapping spaces between
-        the two fields indicated by row and colum index"""
-        overlap_matrix = [[-1 for i in range(16)] for j in range(16)]
-        for i,j in product(range(16), range(16)):
-            spaces_i = self.field_spaceindex_map[self.fields[i]]
-            spaces_j = self.field_spaceindex_map[self.fields[j]]
-            overlap_matrix[i][j] = len(set(spaces_i).intersection(spaces_j))
-        return overlap_matrix
-
-    def new_field_signature(self, new_field):
-        """ signature of a free field is defined as list of space overlap 
-        with all fields that have been played so far """
-        field_idx_seq = [self.fields.index(f) for f, _ in self.move_sequence]
-        signature = [self.pairwise_space_overlap[f][self.fields.index(new_field)] for f in field_idx_seq]
-        return signature
+
+    @property
+    def placed(self):
+        """ per player and shape, list of fields with a token, only used for matplot print """
+        return {p: {s: mask_to_fields(m) for s, m in masks.items()}
+                for p, masks in self.shape_masks.items()}
+
+    @property
+    def tokens_in_spaces(self):
+        """ for each space (by index in self.spaces) a list of shapes of tokens present,
+        underscore stands for no token, only used for debug output """
+        shape_of_field = {f: s for masks in self.placed.values() for s, fields in masks.items() for f in fields}
+        return [[shape_of_field.get(f, '_') for f in space] for space in self.spaces]
+
+    @property
+    def free_fields(self):
+        return mask_to_fields(self.free_mask)
+
+    @property
+    def forbidden(self):
+        """ per player and shape, list of fields where player is forbidden to put a token of shape """
+        return {p: {s: mask_to_fields(m) for s, m in masks.items()}
+                for p, masks in self.forbidden_masks.items()}
+
+    @property
+    def left_pieces(self):
+        """ the tokens left to play, each shape listed once per token """
+        return {p: [s for s, n in counts.items() for _ in range(n)]
+                for p, counts in self.left_counts.items()}
+
+    def position_key(self):
+        """ position as int of 64 bits, 4 bits per field (by field index): 0 for a free field,
+        else 1 + 4 * player index (w 0, b 1) + shape index. the player to move follows from
+        the number of tokens, as w always starts """
+        key = 0
+        for p, player in enumerate(("w", "b")):
+            for s, token in enumerate(TOKENS):
+                code = 1 + 4 * p + s
+                mask = self.shape_masks[player][token]
+                while mask:
+                    low_bit = mask & -mask
+                    key |= code << 4 * (low_bit.bit_length() - 1)
+                    mask ^= low_bit
+        return key
+
+    def to_bytes(self):
+        """ position_key as 8 bytes, little endian """
+        return self.position_key().to_bytes(8, "little")
+
+    @classmethod
+    def from_key(cls, key, verbose_output=True):
+        """ board with the position of position_key. the move sequence is made up from the tokens
+        (alternating players, by field index), raises ValueError for an impossible position """
+        if not 0 <= key < 1 << 64:
+            raise ValueError("invalid position key %x: must fit in 64 bits" % key)
+        tokens = {"w": [], "b": []}
+        for i, field in enumerate(FIELDS):
+            code = key >> 4 * i & 15
+            if code > 8:
+                raise ValueError("invalid position key %x: field code %d" % (key, code))
+            if code:
+                tokens[("w", "b")[(code - 1) >> 2]].append((field, TOKENS[(code - 1) & 3]))
+        if len(tokens["w"]) - len(tokens["b"]) not in (0, 1):
+            raise ValueError("invalid position key %x: w must have the same or one more tokens" % key)
+        board = cls(verbose_output=verbose_output)
+        for moves in zip_longest(tokens["w"], tokens["b"]):
+            for move in moves:
+                if move is not None:
+                    if move not in board.get_possible_moves():
+                        raise ValueError("invalid position key %x: move %s not possible"
+                                         % (key, format_move(move)))
+                    board.make_move(move)
+        # a won space may have been completed by any of the made up moves
+        board.winner = OPPONENT[board.player] if board.game_is_won() else None
+        return board
+
+    @classmethod
+    def from_bytes(cls, data, verbose_output=True):
+        """ board from the bytes of to_bytes """
+        if len(data) != 8:
+            raise ValueError("position must be 8 bytes, got %d" % len(data))
+        return cls.from_key(int.from_bytes(data, "little"), verbose_output=verbose_output)
 
     def reduce_possible_moves(self, pos_moves):
-        """ all possible moves are reduced by grouping all fields with same signature
-        and only considering one representative of each group for a move """
-        pos_moves_signatures = [(self.new_field_signature(f), t) for f, t in pos_moves]
-        reduced_pos_moves = [pos_moves[pos_moves_signatures.index(s)] for s in pos_moves_signatures]
-        return list(set(reduced_pos_moves))
+        """ all possible moves are reduced to one representative of each class of moves
+        that lead to the same position up to symmetry of the board and relabelling of shapes,
+        the first move of each class in pos_moves is kept """
+        return reduce_moves(self, pos_moves)
 
 
     def print_board(self, show_filed_enumeration=False):
-        """ only for debug purpose, print current board with matplotlib """
-        N = 4
-        plot = np.zeros((N, N))
-        annotations = []
-        for s, places in self.placed['w'].items():
-            for p in places:
-                plot[p[0]][p[1]] = 1
-                annotations.append((p[1]+0.4,3-p[0]+0.4, s))
-        for s, places in self.placed['b'].items():
-            for p in places:
-                plot[p[0]][p[1]] = 2
-                annotations.append((p[1]+0.4,3-p[0]+0.4, s))
-        # make a figure + axes
-        fig, ax = plt.subplots(1, 1, tight_layout=True)
-        # make color map
-        my_cmap = colors.ListedColormap(['grey', 'w', 'brown'])
-        # draw the grid
-        for x in range(N + 1):
-            ax.axhline(x, lw=2, color='k', zorder=5)
-            ax.axvline(x, lw=2, color='k', zorder=5)
-        # draw the boxes
-        ax.imshow(plot, interpolation='none', cmap=my_cmap, extent=[0, N, 0, N], zorder=0)
-        for a in annotations:
-            ax.text(*a, fontsize=22)
-        if show_filed_enumeration:
-            field_number_annotation = [(y+0.06,3-x+0.06, i) for i, (x,y) in enumerate(product(range(4),range(4)))]
-            for a in field_number_annotation:
-                ax.text(*a, fontsize=10)   
-        # turn off the axis labels
-        ax.axis('off')
+        """ only for debug purpose, print current board with matplotlib.
+        plotting is imported here, so the engine can be used without matplotlib """
+        from plot_quantik import plot_board
+        plot_board(self, show_filed_enumeration)
     
     def get_possible_moves(self, current_player=True, shuffle=False):
-        """ all moves that current player is allowed to make """
+        """ all moves that current player is allowed to make, each move once """
         possible_moves = []
         if current_player:
             player = self.player
         else:
             player = self._switch_player(self.player)
-        for token in self.left_pieces[player]:
-            fields_possible_for_token = set(self.free_fields) - set(self.forbidden[player][token])
-            possible_moves += [(field, token) for field in fields_possible_for_token]
+        forbidden_masks = self.forbidden_masks[player]
+        for token, count in self.left_counts[player].items():
+            if count:
+                fields_possible_for_token = mask_to_fields(self.free_mask & ~forbidden_masks[token])
+                possible_moves += [(field, token) for field in fields_possible_for_token]
         if shuffle:
             random.shuffle(possible_moves)
         return possible_moves
@@ -127,13 +363,16 @@ class QuantikBoard():
     def make_move(self, move):
         """ update all attributes with the move """
         field, token = move
-        self.placed[self.player][token].append(field)
+        bit = 1 << FIELD_INDEX[field]
+        self.shape_masks[self.player][token] |= bit
         self._update_forbidden(self.player, token, field)
-        self.free_fields.remove(field)
-        self.left_pieces[self.player].remove(token)
+        self.free_mask ^= bit
+        self.player_masks[self.player] ^= bit
+        self.left_counts[self.player][token] -= 1
+        self.zobrist_key ^= ZOBRIST_KEYS[self.player][token][FIELD_INDEX[field]]
         self._update_tokens_in_spaces(field, token)
         self.move_sequence.append(move)
-        if self.game_is_won():
+        if self._move_completes_space(field):
             self.winner = self.player
         self.player = self._switch_player(self.player)
         return self
@@ -144,64 +383,117 @@ class QuantikBoard():
         revert_move = self.move_sequence.pop()
         field, token = revert_move
         self._update_tokens_in_spaces(field, token, revert=True)
-        self.left_pieces[self.player].append(token)
-        self.free_fields.append(field)
-        self.placed[self.player][token].remove(field)
+        bit = 1 << FIELD_INDEX[field]
+        self.left_counts[self.player][token] += 1
+        self.free_mask |= bit
+        self.player_masks[self.player] ^= bit
+        self.shape_masks[self.player][token] ^= bit
+        self.zobrist_key ^= ZOBRIST_KEYS[self.player][token][FIELD_INDEX[field]]
         self._update_forbidden(self.player, token, field, revert=True)
         return self
 
     def game_is_won(self):
-        """ check if game is finished, by checking token list in all spaces"""
-        for tokens in self.tokens_in_spaces:
-            if sorted(tokens) == self.tokens:
+        """ check if game is finished, by checking the shapes in all spaces"""
+        return ALL_SHAPES in self.space_shape_masks
+
+    def _move_completes_space(self, field):
+        """ check if one of the three spaces of the field of the last move has all shapes """
+        masks = self.space_shape_masks
+        for k in FIELD_SPACES[FIELD_INDEX[field]]:
+            if masks[k] == ALL_SHAPES:
                 return True
-        return False 
-
-    def _get_spaces_of_field_as_index(self, field):
-        spaces_of_field = []
-        for i, s in enumerate(self.spaces):
-            if field in s:
-                spaces_of_field .append(i)
-        return spaces_of_field
-            
-           
+        return False
+
     def _switch_player(self, player):  
-        return {"w": "b", "b": "w"}[player] 
+        return OPPONENT[player]
         
     def _update_forbidden(self, player, token, field, revert=False):
-        opponent = self._switch_player(player)
-        new_forbidden_fields = self._influence_field_map(field)
+        opponent_masks = self.forbidden_masks[OPPONENT[player]]
         if not revert:
-            self.forbidden[opponent][token] = self.forbidden[opponent][token]+new_forbidden_fields
+            self._forbidden_history.append(opponent_masks[token])
+            opponent_masks[token] |= INFLUENCE_MASKS[FIELD_INDEX[field]]
         else:
-            for f in new_forbidden_fields:
-                self.forbidden[opponent][token].remove(f)
+            opponent_masks[token] = self._forbidden_history.pop()
         return self
     
     def _update_tokens_in_spaces(self, field, token, revert=False):
-        for i, space in enumerate(self.spaces):
-            for j, p in enumerate(space):
-                if field == p:
-                    if not revert:
-                        self.tokens_in_spaces[i][j] = token
-                    else:
-                        self.tokens_in_spaces[i][j] = '_'
+        spaces = FIELD_SPACES[FIELD_INDEX[field]]
+        masks = self.space_shape_masks
+        if not revert:
+            # a shape can be twice in a space, so masks are restored from history on revert
+            self._space_mask_history.append([masks[k] for k in spaces])
+            bit = SHAPE_BITS[token]
+            for k in spaces:
+                masks[k] |= bit
+        else:
+            for k, mask in zip(spaces, self._space_mask_history.pop()):
+                masks[k] = mask
         return self
 
     def _influence_field_map(self, field):
         """ get all fields which are in the same row, column or square as field"""
-        x, y = field
-        line = [(i, y) for i in range(4) if i != x]
-        column = [(x, i) for i in range(4) if i != y]
-        a = x + (1 - (x%2)*2)
-        b = y + (1 - (y%2)*2)
-        square = [(x,b), (a,y), (a,b)]
-        return line+column+square
+        return _influence_fields(field)
 
     
+class SearchAborted(Exception):
+    """ raised inside the search when the time or node budget of a move is used up """
+
+
 class QuantikAI(QuantikBoard):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, tt_max_entries=2**18, tablebase=None, n_workers=None, verbose_output=True,
+                 collect_stats=False, trace_file=None, endgame_free_fields=9):
+        super().__init__(verbose_output=verbose_output)
+        # search statistics: with collect_stats, each search of minimax_move and analyse is
+        # described by a SearchStats in last_search_stats, passed to the functions in search_hooks
+        # as hook(event, stats) with event "iteration" or, only for minimax_move, "move", and with
+        # trace_file (path or file) written as one json line per move played by minimax_move
+        self.collect_stats = collect_stats
+        self.trace_file = trace_file
+        self.search_hooks = []
+        self.last_search_stats = None
+        self._stats = None
+        # best moves of both players from the position before the last move of minimax_move,
+        # as found by the search, starting with the move played
+        self.principal_variation = []
+        # search results, kept for all moves of one game
+        self.transposition_table = TranspositionTable(tt_max_entries)
+        # worker processes for method "minimax_parallel", started on first use
+        self.n_workers = n_workers
+        self._executor = None
+        self._shared_best_value = None
+        self._shared_stop_flag = None
+        self._shared_node_count = None
+        # solved positions written by solver_quantik.py, given as path or Tablebase
+        if isinstance(tablebase, str):
+            tablebase = Tablebase(tablebase)
+        self.tablebase = tablebase
+        # budget of the running search, checked at every node if abortable
+        self._abortable = False
+        # set by another process to stop the search, only used in worker processes
+        self._stop_flag = None
+        # nodes searched by all processes of a parallel search with node budget, counted against
+        # the budget instead of _search_nodes, only used in worker processes
+        self._node_count = None
+        # threading.Event (or anything with is_set), when set the search stops and plays the best move so far
+        self.cancel_event = None
+        # move ordering: per search depth the last two moves that caused a cutoff,
+        # and per player and move a score of cutoffs, kept (halved) for all moves of a game
+        self.killer_moves = {}
+        self.history = {}
+        self._deadline = None
+        self._node_limit = None
+        self._search_nodes = 0
+        # positions with at most endgame_free_fields free fields are solved exactly by
+        # solve_endgame, with results kept in endgame_cache (zobrist key -> value) for the game
+        self.endgame_free_fields = endgame_free_fields
+        self.endgame_cache = {}
+        self.endgame_cache_max_entries = 2**20
+        # monte carlo search tree of method "mcts", kept for all moves of a game
+        self.mcts_tree = MCTSTree()
+        # iterations of the monte carlo search if no budget is given
+        self.mcts_iterations = 2000
+        # per root move of the last monte carlo search, the number of visits
+        self.last_mcts_visit_counts = {}
 
     def play_one_round(self, method_w, method_b, print_out=True):
         method_map = {"w": method_w,"b": method_b}
@@ -212,86 +504,497 @@ class QuantikAI(QuantikBoard):
             self.print_board()
         return self
         
-    def make_AI_move(self, method):
+    def make_AI_move(self, method, time_budget=None, node_budget=None):
+        """ time_budget in seconds applies to minimax and mcts, node_budget is the number of
+        searched positions for minimax and of iterations for mcts.
+        raises ValueError for a method not in AI_METHODS """
+        if method not in AI_METHODS:
+            raise ValueError("unknown AI method %r" % method)
         if self.winner and (self.winner != "draw"):
-            print("player", self.winner, "won")
+            if self.verbose:
+                print("player", self.winner, "won")
             return self
         elif (len(self.get_possible_moves()) == 0) or (self.winner == "draw"):
             self.winner = "draw"
-            print("draw, player", self.player, "cannot move")
+            if self.verbose:
+                print("draw, player", self.player, "cannot move")
             return self
         elif method == "minimax":
-            return self.minimax_move()    
+            return self.minimax_move(time_budget=time_budget, node_budget=node_budget)
+        elif method == "minimax_parallel":
+            return self.minimax_move(time_budget=time_budget, node_budget=node_budget, parallel=True)
+        elif method == "mcts":
+            return self.mcts_move(time_budget=time_budget, iterations=node_budget)
         elif method == "random":
             return self.random_move()        
     
     def random_move(self):
+        """ random possible move, shapes weighted by the number of tokens left """
         possible_moves = self.get_possible_moves()
-        random_move = possible_moves[random.randint(0,len(possible_moves)-1)]
+        left_counts = self.left_counts[self.player]
+        random_move = random.choices(possible_moves, [left_counts[token] for _, token in possible_moves])[0]
         self.make_move(random_move)
         return self
 
-    def minimax_move(self):
-        """ customized minimax with reduced moves to explore """
-        # first few moves are almost all equivalent, but long to minimax
-        if len(self.move_sequence)<3:
-            return self.random_move()
-        minimax_value = -math.inf
-        minimax_move = None
+    def close(self):
+        """ shut down the worker processes of parallel search """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def minimax_move(self, time_budget=None, node_budget=None, parallel=False):
+        """ customized minimax (principal variation search, see negamax) with reduced moves to
+        explore, searched with iterative deepening.
+        without budget, the first moves are random and the search goes to depth 5. with a time
+        budget (seconds) or a node budget, the search goes deeper until the budget is used up,
+        the best move of the last completed iteration is played.
+        with parallel, the root moves of each iteration are searched in worker processes.
+        positions found in the tablebase are played perfectly without search """
+        self.last_search_stats = None
+        self.principal_variation = []
+        tablebase_move = self.tablebase_move()
+        if tablebase_move is not None:
+            self.make_move(tablebase_move)
+            return self
+        if time_budget is None and node_budget is None:
+            # first few moves are almost all equivalent, but long to minimax
+            if len(self.move_sequence)<3:
+                return self.random_move()
+            max_depth = 5
+        else:
+            max_depth = math.inf
+        minimax_move, _, _ = self._iterative_deepening(max_depth, time_budget, node_budget, parallel)
+        if self.last_search_stats is not None:
+            self._report_move_stats(self.last_search_stats)
+        self.make_move(minimax_move)
+        return self
+
+    def analyse(self, depth=None, time_budget=None, node_budget=None):
+        """ evaluation of the position by the search of minimax_move, without making a move.
+        searches to depth (5 without budget) or until the budget is used up. returns a dict with
+        the best move, its value for the player to move (1 win, -1 loss, 0 draw or unknown), the
+        depth of the last completed iteration, the principal variation, searched nodes and
+        seconds, None if the game is over. raises ValueError for a negative depth """
+        if depth is not None and depth < 0:
+            raise ValueError("depth must not be negative")
+        self.last_search_stats = None
+        if self.winner or not self.get_possible_moves():
+            return None
+        if depth is not None:
+            max_depth = depth
+        elif time_budget is None and node_budget is None:
+            max_depth = 5
+        else:
+            max_depth = math.inf
+        start = time.perf_counter()
+        move, value, completed_depth = self._iterative_deepening(max_depth, time_budget, node_budget)
+        return {"move": move, "value": value, "depth": completed_depth,
+                "pv": list(self.principal_variation), "nodes": self._search_nodes,
+                "seconds": time.perf_counter() - start}
+
+    def _iterative_deepening(self, max_depth, time_budget, node_budget, parallel=False):
+        """ the best move, its value and the depth of the last completed iteration, the board is
+        left unchanged """
+        self.principal_variation = []
+        self.transposition_table.new_search()
+        self.killer_moves = {}
+        self.history = {k: v // 2 for k, v in self.history.items() if v > 1}
+        self._search_nodes = 0
+        self._node_limit = node_budget
+        self._deadline = None if time_budget is None else time.perf_counter() + time_budget
+        start = time.perf_counter()
+        if self.collect_stats or self.search_hooks or self.trace_file is not None:
+            self._stats = SearchStats()
+        search_root_moves = self._search_root_moves_parallel if parallel else self._search_root_moves
+        pos_moves = self.get_possible_moves(shuffle=True)
+        pos_moves_reduced = self.order_moves(self.reduce_possible_moves(pos_moves), depth=None)
+        minimax_move = pos_moves_reduced[0]
+        minimax_value = None
+        completed_depth = None
+        n_moves_played = len(self.move_sequence)
+        # after the root move and depth+1 more moves the board is full, deeper iterations find nothing new
+        n_free_fields = bin(self.free_mask).count("1")
+        depth = 0
+        while depth <= min(max_depth, n_free_fields - 1):
+            # the first iteration always completes, so there is a move to play
+            self._abortable = depth > 0
+            try:
+                results = search_root_moves(pos_moves_reduced, depth)
+            except SearchAborted:
+                while len(self.move_sequence) > n_moves_played:
+                    self.revert_last_move()
+                break
+            # next iteration starts with the best moves of this one, moves with a value that
+            # is only an upper bound come after moves with the same exact value
+            searched = [i for i, r in enumerate(results) if r is not None]
+            order = (sorted(searched, key=lambda i: (-results[i][0], results[i][1]))
+                     + [i for i, r in enumerate(results) if r is None])
+            pos_moves_reduced = [pos_moves_reduced[i] for i in order]
+            minimax_move = pos_moves_reduced[0]
+            minimax_value = results[order[0]][0]
+            completed_depth = depth
+            self.principal_variation = [minimax_move] + results[order[0]][2]
+            if self._stats is not None:
+                self._stats.iterations.append({"depth": depth, "nodes": self._stats.nodes,
+                                               "seconds": time.perf_counter() - start,
+                                               "move": format_move(minimax_move),
+                                               "value": minimax_value,
+                                               "pv": [format_move(m) for m in self.principal_variation]})
+                for hook in self.search_hooks:
+                    hook("iteration", self._stats)
+            # proven win or loss, searching deeper does not change the outcome
+            if abs(minimax_value) >= 1:
+                break
+            depth += 1
+        self._abortable = False
+        if self._stats is not None:
+            stats = self._stats
+            self._stats = None
+            stats.move = minimax_move
+            stats.wall_time = time.perf_counter() - start
+            self.last_search_stats = stats
+        return minimax_move, minimax_value, completed_depth
+
+    def mcts_move(self, time_budget=None, iterations=None):
+        """ monte carlo tree search with UCT selection and random playouts, see mcts_quantik.py.
+        runs for time_budget seconds or the given number of iterations, without budget for
+        mcts_iterations iterations. the tree of the previous move is reused, the visit counts of
+        the search are kept in last_mcts_visit_counts """
+        self.last_search_stats = None
+        if time_budget is None and iterations is None:
+            iterations = self.mcts_iterations
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        should_stop = None if self.cancel_event is None else self.cancel_event.is_set
+        self.mcts_tree.advance(self.move_sequence)
+        self.mcts_tree.search(self, iterations, deadline, should_stop)
+        self.last_mcts_visit_counts = self.mcts_tree.visit_counts()
+        self.make_move(self.mcts_tree.best_move())
+        return self
+
+    def _report_move_stats(self, stats):
+        """ pass the statistics of the search of a move to the search hooks and the trace file,
+        before the move is made """
+        for hook in self.search_hooks:
+            hook("move", stats)
+        if self.trace_file is not None:
+            line = json.dumps(dict(stats.to_dict(), n_moves_played=len(self.move_sequence))) + "\n"
+            if isinstance(self.trace_file, str):
+                with open(self.trace_file, "a") as f:
+                    f.write(line)
+            else:
+                self.trace_file.write(line)
+
+    def tablebase_move(self):
+        """ best move by the tablebase, None without tablebase or if not all
+        positions after the possible moves are in the table """
+        if self.tablebase is None:
+            return None
+        best_move = None
+        best_score = None
+        for move in self.reduce_possible_moves(self.get_possible_moves(shuffle=True)):
+            self.make_move(move)
+            if self.winner:
+                # the opponent has lost, no moves left to play
+                result = (LOSS, 0)
+            else:
+                result = self.tablebase.probe(self)
+            self.revert_last_move()
+            if result is None:
+                return None
+            score = outcome_score(OUTCOME_BEFORE_MOVE[result[0]], result[1] + 1)
+            if best_score is None or score > best_score:
+                best_move, best_score = move, score
+        return best_move
+
+    def _search_root_moves(self, root_moves, max_depth):
+        """ per root move (value, is_upper_bound, principal variation after the move), None for the
+        moves after the first winning move. the first move is searched with the full window, the
+        others with a null window at the best value so far, a value not above it is only an upper
+        bound of the value of the move """
+        best_value = -1
+        results = [None] * len(root_moves)
+        for i, move in enumerate(root_moves):
+            self.make_move(move)
+            value, pv = self._search_move_value(best_value, +1, 0, max_depth, null_window=i > 0)
+            self.revert_last_move()
+            results[i] = (value, -1 < value <= best_value, pv)
+            if value >= 1:
+                break
+            best_value = max(best_value, value)
+        return results
+
+    def _search_root_moves_parallel(self, root_moves, max_depth):
+        """ as _search_root_moves, with the root moves searched in worker processes.
+        the first move is searched here, to start the workers with its value as alpha
+        (young brothers wait). the best value so far is shared between the workers as alpha,
+        a winning move stops all other searches """
+        # imported here, processes that do not search in parallel start faster without them
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+        if self._executor is None:
+            self._shared_best_value = multiprocessing.Value("i", -1)
+            self._shared_stop_flag = multiprocessing.Value("b", 0)
+            self._shared_node_count = multiprocessing.Value("q", 0)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_workers, initializer=_init_search_worker,
+                initargs=(self._shared_best_value, self._shared_stop_flag, self._shared_node_count,
+                          self.transposition_table.max_entries, self.endgame_free_fields))
+        results = [None] * len(root_moves)
+        results[0] = self._search_root_moves(root_moves[:1], max_depth)[0]
+        if results[0][0] >= 1:
+            return results
+        self._shared_best_value.value = results[0][0]
+        self._shared_stop_flag.value = 0
+        # wall clock time is the same in all processes, unlike perf_counter
+        wall_deadline = None if self._deadline is None else time.time() + self._deadline - time.perf_counter()
+        # the workers count their nodes together, on top of the nodes searched so far
+        self._shared_node_count.value = self._search_nodes
+        futures = {self._executor.submit(_search_root_move_in_worker, self.move_sequence, move,
+                                         max_depth, wall_deadline, self._node_limit, self._abortable,
+                                         self.transposition_table.generation, self._stats is not None): i
+                   for i, move in enumerate(root_moves) if i > 0}
+        aborted = False
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.cancelled():
+                    continue
+                value, alpha, pv, n_nodes, stats = future.result()
+                self._search_nodes += n_nodes
+                if stats is not None:
+                    self._stats.add(stats)
+                if value is None:
+                    aborted = True
+                    continue
+                results[futures[future]] = (value, -1 < value <= alpha, pv)
+                if value >= 1:
+                    for f in pending:
+                        f.cancel()
+        if aborted and not any(r is not None and r[0] >= 1 for r in results):
+            raise SearchAborted()
+        return results
+
+    def winning_moves(self):
+        """ moves that complete a space: the space has three different shapes and one free field """
+        wins = set()
+        free_mask = self.free_mask
+        for space_mask, shape_mask in zip(SPACE_MASKS, self.space_shape_masks):
+            free_in_space = space_mask & free_mask
+            if shape_mask in MISSING_SHAPE and free_in_space and not free_in_space & (free_in_space - 1):
+                wins.add((FIELDS[free_in_space.bit_length() - 1], MISSING_SHAPE[shape_mask]))
+        return wins
+
+    def order_moves(self, moves, depth):
+        """ winning moves first, then the killer moves of the depth, then by history score.
+        sorting is stable, so moves keep their given (shuffled) order on ties """
+        wins = self.winning_moves()
+        killers = self.killer_moves.get(depth, ())
+        history = self.history
         player = self.player
+        return sorted(moves, key=lambda m: (m not in wins, m not in killers,
+                                            -history.get((player, m), 0)))
+
+    def _record_cutoff(self, move, depth, max_depth):
+        """ remember a move that caused a beta (or alpha) cutoff for move ordering """
+        killers = self.killer_moves.setdefault(depth, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (self.player, move)
+        self.history[key] = self.history.get(key, 0) + (max_depth - depth) ** 2
+
+    def _check_search_budget(self):
+        n_nodes = self._search_nodes
+        if self._node_count is not None:
+            with self._node_count.get_lock():
+                self._node_count.value += 1
+                n_nodes = self._node_count.value
+        if ((self._node_limit is not None and n_nodes > self._node_limit)
+                or (self._deadline is not None and time.perf_counter() > self._deadline)
+                or (self._stop_flag is not None and self._stop_flag.value)
+                or (self.cancel_event is not None and self.cancel_event.is_set())):
+            raise SearchAborted()
+
+    def negamax(self, alpha, beta, depth, max_depth=5):
+        """ principal variation search, negamax with alpha beta pruning: value of the position for
+        the player to move (1 win, -1 loss, 0 draw or unknown at max_depth) and the principal
+        variation, the best moves from here as far as searched. the value is exact inside the
+        window alpha, beta and a bound outside. the first move is searched with the full window,
+        the others with a null window and only searched again if they are better """
+        self._search_nodes += 1
+        if self._abortable:
+            self._check_search_budget()
+        stats = self._stats
+        if stats is not None:
+            stats.nodes_per_depth[depth] = stats.nodes_per_depth.get(depth, 0) + 1
+        if self.winner:
+            # the player who made the last move has won
+            return -1, []
+        elif bin(self.free_mask).count("1") <= self.endgame_free_fields:
+            return self.solve_endgame(), []
+        elif depth >= max_depth:
+            return 0, []
+        # values in the table are from view of the player to move
+        entry = self.transposition_table.lookup(self.zobrist_key)
+        if entry is not None:
+            _, entry_depth, bound, value, _ = entry
+            # a proven win or loss holds at any depth
+            proven = ((bound == EXACT and value != 0) or (bound == LOWER_BOUND and value >= 1)
+                      or (bound == UPPER_BOUND and value <= -1))
+            if proven or entry_depth >= max_depth - depth:
+                if stats is not None:
+                    stats.tt_hits += 1
+                if bound == EXACT:
+                    return value, []
+                elif bound == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, []
         pos_moves = self.get_possible_moves(shuffle=True)
-        pos_moves_reduced = self.reduce_possible_moves(pos_moves)
+        if not pos_moves:
+            # the player to move cannot move, a draw
+            return 0, []
+        pos_moves_reduced = self.order_moves(self.reduce_possible_moves(pos_moves), depth)
+        window_alpha = alpha
+        value, pv = -1, None
+        n_searched = 0
         for move in pos_moves_reduced:
             self.make_move(move)
-            value = self.alphabeta_minimax(maximizing_player=player, 
-                            is_max_turn=False, alpha=-1, beta=+1, depth=0, file=None)
+            move_value, move_pv = self._search_move_value(alpha, beta, depth + 1, max_depth,
+                                                          null_window=n_searched > 0)
             self.revert_last_move()
-            # print(value, end=', ')
-            if value >= 1:
-                minimax_move = move
+            n_searched += 1
+            if pv is None or move_value > value:
+                value, pv = move_value, [move] + move_pv
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self._record_cutoff(move, depth, max_depth)
+                if stats is not None:
+                    # odd depths are positions of the searching player
+                    if depth % 2:
+                        stats.beta_cutoffs += 1
+                    else:
+                        stats.alpha_cutoffs += 1
                 break
-            elif (value >= minimax_value):
-                minimax_value = value
-                minimax_move = move
-        self.make_move(minimax_move)
-        return self 
+        if stats is not None:
+            stats.expanded_nodes += 1
+            stats.children_searched += n_searched
+            stats.moves_generated += len(pos_moves)
+            stats.moves_after_reduction += len(pos_moves_reduced)
+        if value <= window_alpha:
+            bound = UPPER_BOUND
+        elif value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.transposition_table.store(self.zobrist_key, max_depth - depth, bound, value)
+        return value, pv
 
+    def _search_move_value(self, alpha, beta, depth, max_depth, null_window):
+        """ value and principal variation of the position after a move that was just made,
+        from view of the player who made it, in the window alpha, beta. with null_window,
+        the move is first only tested to be better than alpha """
+        if null_window:
+            value, pv = self.negamax(-alpha - 1, -alpha, depth, max_depth)
+            if not alpha < -value < beta:
+                return -value, pv
+            if self._stats is not None:
+                self._stats.re_searches += 1
+        value, pv = self.negamax(-beta, -alpha, depth, max_depth)
+        return -value, pv
 
-    def alphabeta_minimax(self, maximizing_player, is_max_turn, alpha, beta, depth, file):
-        """ minimax with alpha beta pruning """
-        
-        if len(self.get_possible_moves()) == 0:
-            return 0
-        elif (self.winner == maximizing_player):
-            return 1
-        elif (self.winner == self._switch_player(maximizing_player)):
-            return -1
-        elif depth >= 5:
-            return 0
-        elif is_max_turn:   
-            value = -1
-            pos_moves = self.get_possible_moves(shuffle=True)
-            pos_moves_reduced = self.reduce_possible_moves(pos_moves)
-            for move in pos_moves_reduced:
-                self.make_move(move)
-                value = max(value, self.alphabeta_minimax(maximizing_player, False, alpha, beta, depth+1, file))
-                self.revert_last_move()
-                if value >= beta:
-                    break
-                alpha = max(alpha, value)
+    def solve_endgame(self):
+        """ exact value of the position for the player to move (1 win, 0 draw, -1 loss), searched
+        to the end of the game. only a win stops the search of the moves early, so every value is
+        exact and is cached in endgame_cache """
+        self._search_nodes += 1
+        if self._abortable:
+            self._check_search_budget()
+        if self._stats is not None:
+            self._stats.endgame_nodes += 1
+        value = self.endgame_cache.get(self.zobrist_key)
+        if value is not None:
             return value
+        if self.winner:
+            # the player who made the last move has won
+            return -1
+        pos_moves = self.get_possible_moves()
+        wins = self.winning_moves()
+        if not pos_moves:
+            value = 0
+        elif any(move in wins for move in pos_moves):
+            value = 1
         else:
-            #print("|",end="")
-            value = +1
-            pos_moves = self.get_possible_moves(shuffle=True)
-            pos_moves_reduced = self.reduce_possible_moves(pos_moves)
-            for move in pos_moves_reduced: 
+            # symmetry reduction costs more than it saves this close to the end
+            value = -1
+            for move in pos_moves:
                 self.make_move(move)
-                value = min(value, self.alphabeta_minimax(maximizing_player, True, alpha, beta, depth+1, file))
+                value = max(value, -self.solve_endgame())
                 self.revert_last_move()
-                if value <= alpha:
+                if value >= 1:
                     break
-                beta = min(beta, value)
-            return value
+        if len(self.endgame_cache) >= self.endgame_cache_max_entries:
+            self.endgame_cache.clear()
+        self.endgame_cache[self.zobrist_key] = value
+        return value
 
-        
+
+# state of a worker process of parallel search, set by _init_search_worker
+_worker_state = {}
+
+
+def _init_search_worker(shared_best_value, stop_flag, node_count, tt_max_entries, endgame_free_fields):
+    _worker_state["best_value"] = shared_best_value
+    _worker_state["stop_flag"] = stop_flag
+    _worker_state["node_count"] = node_count
+    _worker_state["endgame_free_fields"] = endgame_free_fields
+    # kept for all searches in the worker process
+    _worker_state["transposition_table"] = TranspositionTable(tt_max_entries)
+    _worker_state["endgame_cache"] = {}
+
+
+def _search_root_move_in_worker(move_sequence, move, max_depth, wall_deadline, node_budget, abortable,
+                                generation, collect_stats):
+    """ value of the root move after move_sequence, the alpha it was searched with, the principal
+    variation after the move, the number of nodes searched and with collect_stats the SearchStats
+    of the search, else None. value is None if the search was stopped.
+    node_budget is the budget of the whole search, counted with the nodes of all workers.
+    generation is the one of the transposition table of the parent, counting its searches """
+    best_value = _worker_state["best_value"]
+    stop_flag = _worker_state["stop_flag"]
+    node_count = _worker_state["node_count"]
+    # stopped, or the node budget was used up by the moves searched before
+    if stop_flag.value or (abortable and node_budget is not None and node_count.value >= node_budget):
+        return None, None, None, 0, None
+    ai = QuantikAI(tt_max_entries=1, verbose_output=False,
+                   endgame_free_fields=_worker_state["endgame_free_fields"])
+    ai.transposition_table = _worker_state["transposition_table"]
+    # a new search of the parent, entries of its earlier searches are replaced first
+    if ai.transposition_table.generation != generation:
+        ai.transposition_table.new_search()
+        ai.transposition_table.generation = generation
+    ai.endgame_cache = _worker_state["endgame_cache"]
+    for m in move_sequence:
+        ai.make_move(m)
+    ai.make_move(move)
+    ai._abortable = abortable
+    ai._stop_flag = stop_flag
+    ai._node_limit = node_budget
+    if collect_stats:
+        ai._stats = SearchStats()
+    if node_budget is not None:
+        ai._node_count = node_count
+    ai._deadline = None if wall_deadline is None else time.perf_counter() + wall_deadline - time.time()
+    alpha = best_value.value
+    try:
+        value, pv = ai._search_move_value(alpha, +1, 0, max_depth, null_window=True)
+    except SearchAborted:
+        return None, alpha, None, ai._search_nodes, ai._stats
+    with best_value.get_lock():
+        best_value.value = max(best_value.value, value)
+    if value >= 1:
+        stop_flag.value = 1
+    return value, alpha, pv, ai._search_nodes, ai._stats
@@ -0,0 +1,133 @@
+import mmap
+import struct
+from game_quantik import encode_move, decode_move
+"""
+append-only binary file of finished games, e.g. from self-play:
+a header (magic, format version) followed by records of fixed size, so game i is found at
+HEADER.size + i * RECORD_SIZE without an index.
+a record is one byte with the number of moves (lower five bits) and the winner (upper bits,
+see WINNER_CODES), followed by 16 move bytes (encode_move of game_quantik.py), unused ones 0xFF.
+a record cut off by an interrupted write at the end of the file is ignored by the reader
+"""
+MAGIC = b"QTKG"
+VERSION = 1
+HEADER = struct.Struct("<4sI")
+MAX_MOVES = 16
+RECORD_SIZE = 1 + MAX_MOVES
+NO_MOVE = 0xFF
+# winner of a game -> code in the record, None for a game that was not finished
+WINNER_CODES = {None: 0, "w": 1, "b": 2, "draw": 3}
+WINNERS = {code: winner for winner, code in WINNER_CODES.items()}
+
+
+def pack_game(move_sequence, winner):
+    """ record bytes of a game """
+    if len(move_sequence) > MAX_MOVES:
+        raise ValueError("a game has at most %d moves" % MAX_MOVES)
+    moves = bytes(encode_move(m) for m in move_sequence)
+    return (bytes((WINNER_CODES[winner] << 5 | len(moves),)) + moves
+            + bytes((NO_MOVE,)) * (MAX_MOVES - len(moves)))
+
+
+def unpack_game(record):
+    """ move sequence and winner of record bytes """
+    n_moves = record[0] & 31
+    return [decode_move(c) for c in record[1:1 + n_moves]], WINNERS[record[0] >> 5]
+
+
+def _check_header(data, path):
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("%s is not a quantik game log of version %d" % (path, VERSION))
+
+
+class GameLogWriter():
+    """ appends games to a game log file, which is created if it does not exist.
+    records are buffered by the file object, flush or close to make them visible to readers """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+        else:
+            with open(path, "rb") as f:
+                _check_header(f.read(HEADER.size), path)
+            # drop a record cut off by an interrupted write, so new records stay aligned
+            size = self._file.tell()
+            aligned = size - (size - HEADER.size) % RECORD_SIZE
+            if aligned != size:
+                self._file.truncate(aligned)
+                self._file.seek(aligned)
+
+    def write(self, move_sequence, winner):
+        self._file.write(pack_game(move_sequence, winner))
+
+    def write_game(self, board):
+        """ append the moves and winner of a board, e.g. a QuantikAI after play_one_round """
+        self.write(board.move_sequence, board.winner)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameLogReader():
+    """ random access to the games of a game log file, memory mapped on first access.
+    games appended after the file was mapped are seen after reopen() """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        self._n_games = None
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self._mmap, self.path)
+        self._n_games = (len(self._mmap) - HEADER.size) // RECORD_SIZE
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = None
+
+    def reopen(self):
+        self.close()
+        self._open()
+
+    def __len__(self):
+        if self._mmap is None:
+            self._open()
+        return self._n_games
+
+    def record(self, i):
+        """ record bytes of game i """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("game index out of range")
+        offset = HEADER.size + i * RECORD_SIZE
+        return self._mmap[offset:offset + RECORD_SIZE]
+
+    def __getitem__(self, i):
+        """ move sequence and winner of game i """
+        return unpack_game(self.record(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
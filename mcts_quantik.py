@@ -0,0 +1,129 @@
+import math
+import random
+import time
+"""
+monte carlo tree search, used by QuantikAI.make_AI_move with method "mcts".
+each iteration descends the tree by UCT selection, adds one node, plays random moves from there
+to the end of the game and adds the result to all nodes on the path.
+the tree is kept between moves, the subtree of the moves actually played is reused
+"""
+# weight of exploration against the mean result in the UCT selection
+EXPLORATION = math.sqrt(2)
+# results for the player who made the move leading to a node
+WIN_RESULT, DRAW_RESULT, LOSS_RESULT = 1.0, 0.5, 0.0
+
+
+class MCTSNode():
+    """ position reached by move from the parent node """
+    __slots__ = ("move", "parent", "children", "untried_moves", "visits", "value", "terminal")
+
+    def __init__(self, move=None, parent=None):
+        self.move = move
+        self.parent = parent
+        # move -> MCTSNode
+        self.children = {}
+        # possible moves without a child node yet, None until the node is selected
+        self.untried_moves = None
+        self.visits = 0
+        # sum of the results for the player who made move
+        self.value = 0.0
+        # result for the player who made move if the game has ended, else None
+        self.terminal = None
+
+    def uct_child(self, exploration):
+        """ child with the highest upper confidence bound of its mean result """
+        log_visits = math.log(self.visits)
+        return max(self.children.values(),
+                   key=lambda c: c.value / c.visits + exploration * math.sqrt(log_visits / c.visits))
+
+
+class MCTSTree():
+    """ search tree of one game, the root is the position after root_sequence """
+
+    def __init__(self, exploration=EXPLORATION):
+        self.exploration = exploration
+        self.root = MCTSNode()
+        self.root_sequence = ()
+
+    def advance(self, move_sequence):
+        """ make the position after move_sequence the root, keeping the subtree if move_sequence
+        continues the current root sequence, else starting a new tree """
+        move_sequence = tuple(move_sequence)
+        node = None
+        if move_sequence[:len(self.root_sequence)] == self.root_sequence:
+            node = self.root
+            for move in move_sequence[len(self.root_sequence):]:
+                node = node.children.get(move)
+                if node is None:
+                    break
+        if node is None:
+            node = MCTSNode()
+        node.parent = None
+        self.root = node
+        self.root_sequence = move_sequence
+
+    def search(self, board, iterations=None, deadline=None, should_stop=None):
+        """ grow the tree, board is at the root position and is restored after each iteration.
+        runs the given number of iterations, until deadline (time.perf_counter) or until
+        should_stop() returns True, at least one iteration. returns the number of iterations """
+        n_iterations = 0
+        while True:
+            self._iterate(board)
+            n_iterations += 1
+            if ((iterations is not None and n_iterations >= iterations)
+                    or (deadline is not None and time.perf_counter() > deadline)
+                    or (should_stop is not None and should_stop())):
+                return n_iterations
+
+    def _iterate(self, board):
+        n_moves_played = len(board.move_sequence)
+        node = self.root
+        # selection, down to a node with moves not yet expanded or the end of the game
+        while node.terminal is None:
+            if node.untried_moves is None:
+                node.untried_moves = board.get_possible_moves()
+                random.shuffle(node.untried_moves)
+                if not node.untried_moves:
+                    # the player to move cannot move, as in QuantikAI this is a draw
+                    node.terminal = DRAW_RESULT
+                    break
+            if node.untried_moves:
+                break
+            node = node.uct_child(self.exploration)
+            board.make_move(node.move)
+        # expansion
+        if node.terminal is None:
+            child = MCTSNode(node.untried_moves.pop(), node)
+            node.children[child.move] = child
+            node = child
+            board.make_move(node.move)
+            if board.winner:
+                node.terminal = WIN_RESULT
+        result = node.terminal if node.terminal is not None else self._playout(board)
+        while len(board.move_sequence) > n_moves_played:
+            board.revert_last_move()
+        # backpropagation, the result alternates between the players
+        while node is not None:
+            node.visits += 1
+            node.value += result
+            result = 1 - result
+            node = node.parent
+
+    def _playout(self, board):
+        """ random moves to the end of the game, result for the player who moved last before """
+        player = board.player
+        while True:
+            moves = board.get_possible_moves()
+            if not moves:
+                return DRAW_RESULT
+            board.make_move(moves[random.randint(0, len(moves) - 1)])
+            if board.winner:
+                return LOSS_RESULT if board.winner == player else WIN_RESULT
+
+    def visit_counts(self):
+        """ per move at the root, the number of visits """
+        return {move: child.visits for move, child in self.root.children.items()}
+
+    def best_move(self):
+        """ most visited move at the root, ties broken by mean result """
+        return max(self.root.children.values(), key=lambda c: (c.visits, c.value / c.visits)).move
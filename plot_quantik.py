@@ -0,0 +1,41 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib import colors
+from itertools import product
+"""
+rendering of a quantik board with matplotlib, kept apart from the engine in game_quantik.py
+so that search and self-play do not import matplotlib
+"""
+
+
+def plot_board(board, show_filed_enumeration=False):
+    """ only for debug purpose, print board with matplotlib """
+    N = 4
+    plot = np.zeros((N, N))
+    annotations = []
+    for s, places in board.placed['w'].items():
+        for p in places:
+            plot[p[0]][p[1]] = 1
+            annotations.append((p[1]+0.4,3-p[0]+0.4, s))
+    for s, places in board.placed['b'].items():
+        for p in places:
+            plot[p[0]][p[1]] = 2
+            annotations.append((p[1]+0.4,3-p[0]+0.4, s))
+    # make a figure + axes
+    fig, ax = plt.subplots(1, 1, tight_layout=True)
+    # make color map
+    my_cmap = colors.ListedColormap(['grey', 'w', 'brown'])
+    # draw the grid
+    for x in range(N + 1):
+        ax.axhline(x, lw=2, color='k', zorder=5)
+        ax.axvline(x, lw=2, color='k', zorder=5)
+    # draw the boxes
+    ax.imshow(plot, interpolation='none', cmap=my_cmap, extent=[0, N, 0, N], zorder=0)
+    for a in annotations:
+        ax.text(*a, fontsize=22)
+    if show_filed_enumeration:
+        field_number_annotation = [(y+0.06,3-x+0.06, i) for i, (x,y) in enumerate(product(range(4),range(4)))]
+        for a in field_number_annotation:
+            ax.text(*a, fontsize=10)   
+    # turn off the axis labels
+    ax.axis('off')
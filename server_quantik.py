@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from analyse_quantik import analyse_position
+from game_quantik import QuantikBoard, parse_move
+"""
+engine server: many games hosted on one asyncio event loop, searches run in a bounded pool of
+worker processes. the server speaks a line protocol over stdin/stdout, tcp or a unix socket,
+every connection has its own games, named by the client:
+
+    new <game>                       start a game, reply: ok <game>
+    position <game> [<move> ...]     set the position by the moves from the start, e.g. 00C 11H
+                                     reply: ok <game>
+    go <game> [depth <d>] [time <seconds>] [nodes <n>]
+                                     start a search (depth 5 without budget), when it is finished
+                                     reply: bestmove <game> <move> value <v> depth <d> nodes <n> pv <moves>
+                                     or, if the game is over: bestmove <game> none winner <w|b|draw>
+    stop <game>                      stop the search, the best move so far is sent as bestmove
+    close <game>                     end a game, reply: ok <game>
+    isready                          reply: readyok
+    quit                             close the connection
+
+a new position, new or close discards the running search of the game. errors are replied as
+error <message>, a search that fails as error <game> <message>. at the end of input, running
+searches are finished and their results sent
+
+usage: python server_quantik.py [--tcp host:port | --unix path] [--workers 4] [--max-searches 16]
+"""
+COMMANDS = ("new", "position", "go", "stop", "close")
+BUDGETS = {"depth": int, "time": float, "nodes": int}
+
+# state of a worker process, set by _init_worker
+_worker_state = {}
+
+
+class _StopFlag():
+    """ cancel event of a search in a worker process, set by the server in the shared array """
+
+    def __init__(self, stop_flags, slot):
+        self.stop_flags = stop_flags
+        self.slot = slot
+
+    def is_set(self):
+        return bool(self.stop_flags[self.slot])
+
+
+def _init_worker(stop_flags):
+    _worker_state["stop_flags"] = stop_flags
+
+
+def _search(move_sequence, depth, time_budget, node_budget, slot):
+    try:
+        return analyse_position(move_sequence, depth, time_budget, node_budget,
+                                cancel_event=_StopFlag(_worker_state["stop_flags"], slot))
+    except ValueError as error:
+        return {"error": str(error)}
+
+
+def format_result(game, result):
+    """ reply line for the result of analyse_position """
+    if "error" in result:
+        return "error %s %s" % (game, result["error"])
+    if result.get("game_over"):
+        return "bestmove %s none winner %s" % (game, result["winner"])
+    return ("bestmove %s %s value %d depth %d nodes %d pv %s"
+            % (game, result["move"], result["value"], result["depth"], result["nodes"],
+               " ".join(result["pv"])))
+
+
+class Session():
+    """ a game of a connection """
+
+    def __init__(self):
+        self.move_sequence = []
+        # running search (asyncio task) and its slot in the stop flags, None if not searching
+        self.search = None
+        self.slot = None
+
+
+class EngineServer():
+    """ runs the searches of all connections in n_workers processes, at most max_searches
+    at a time (running or waiting for a worker) """
+
+    def __init__(self, n_workers=None, max_searches=None):
+        n_workers = n_workers or os.cpu_count() or 1
+        self.max_searches = max_searches or 4 * n_workers
+        # per slot a flag to stop the search using the slot, shared with the workers
+        self.stop_flags = multiprocessing.Array("b", self.max_searches, lock=False)
+        self.free_slots = list(range(self.max_searches))
+        self.executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                            initargs=(self.stop_flags,))
+        # start the workers now: forked later, while a thread reads stdin (serve_stdio) and holds
+        # the lock of its buffer, a worker would hang when it closes its copy of stdin
+        self.executor.submit(int).result()
+
+    def close(self):
+        for slot in range(self.max_searches):
+            self.stop_flags[slot] = 1
+        self.executor.shutdown(cancel_futures=True)
+
+    async def serve(self, readline, write):
+        """ handle the commands of one connection until quit or the end of input. readline is a
+        coroutine function returning the next line ("" at the end), write sends one line.
+        at the end of input, running searches are finished and their results sent,
+        quit discards them """
+        sessions = {}
+        finish_searches = False
+        try:
+            while True:
+                line = await readline()
+                if not line:
+                    finish_searches = True
+                    break
+                words = line.split()
+                if not words:
+                    continue
+                if words[0] == "quit":
+                    break
+                try:
+                    self.handle(sessions, words, write)
+                except ValueError as error:
+                    write("error %s" % error)
+        finally:
+            searches = [s.search for s in sessions.values() if s.search is not None]
+            if not finish_searches:
+                for session in sessions.values():
+                    self._discard_search(session)
+            await asyncio.gather(*searches, return_exceptions=True)
+
+    def handle(self, sessions, words, write):
+        """ run one command, raises ValueError for an invalid command """
+        command, args = words[0], words[1:]
+        if command == "isready":
+            write("readyok")
+            return
+        if command not in COMMANDS:
+            raise ValueError("unknown command %s" % command)
+        if not args:
+            raise ValueError("%s needs a game" % command)
+        game, args = args[0], args[1:]
+        if command == "new":
+            if game in sessions:
+                self._discard_search(sessions[game])
+            sessions[game] = Session()
+            write("ok %s" % game)
+            return
+        session = sessions.get(game)
+        if session is None:
+            raise ValueError("unknown game %s" % game)
+        if command == "position":
+            move_sequence = self._parse_position(args)
+            self._discard_search(session)
+            session.move_sequence = move_sequence
+            write("ok %s" % game)
+        elif command == "go":
+            if session.search is not None:
+                raise ValueError("game %s is already searching" % game)
+            budget = self._parse_budget(args)
+            if not self.free_slots:
+                raise ValueError("too many searches running, try again later")
+            session.slot = self.free_slots.pop()
+            self.stop_flags[session.slot] = 0
+            session.search = asyncio.ensure_future(
+                self._run_search(game, session, list(session.move_sequence), budget, session.slot, write))
+        elif command == "stop":
+            if session.search is None:
+                raise ValueError("game %s is not searching" % game)
+            self.stop_flags[session.slot] = 1
+        elif command == "close":
+            self._discard_search(session)
+            del sessions[game]
+            write("ok %s" % game)
+
+    def _discard_search(self, session):
+        """ stop the running search of session without sending its result """
+        if session.search is not None:
+            self.stop_flags[session.slot] = 1
+            session.search = None
+
+    @staticmethod
+    def _parse_position(args):
+        board = QuantikBoard(verbose_output=False)
+        for text in args:
+            move = parse_move(text)
+            if board.winner or move not in board.get_possible_moves():
+                raise ValueError("move %s is not possible" % text)
+            board.make_move(move)
+        return list(board.move_sequence)
+
+    @staticmethod
+    def _parse_budget(args):
+        """ depth, time and nodes of the arguments of go, None if not given """
+        if len(args) % 2:
+            raise ValueError("go takes pairs of budget and value")
+        budget = dict.fromkeys(BUDGETS)
+        for name, value in zip(args[::2], args[1::2]):
+            if name not in BUDGETS:
+                raise ValueError("unknown budget %s" % name)
+            budget[name] = BUDGETS[name](value)
+            if not math.isfinite(budget[name]):
+                raise ValueError("invalid %s %s" % (name, value))
+            # depth 0 only looks at the moves of the position, time and nodes must allow a search
+            if budget[name] < 0 or (budget[name] == 0 and name != "depth"):
+                raise ValueError("invalid %s %s" % (name, value))
+        return budget["depth"], budget["time"], budget["nodes"]
+
+    async def _run_search(self, game, session, move_sequence, budget, slot, write):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, _search, move_sequence, *budget, slot)
+            line = format_result(game, result)
+        except Exception as error:
+            # e.g. a worker process that died, the client is told instead of waiting forever
+            line = "error %s search failed: %r" % (game, error)
+        finally:
+            self.free_slots.append(slot)
+        # the search was discarded, or replaced by a new one
+        if session.search is not asyncio.current_task():
+            return
+        session.search = None
+        write(line)
+
+
+async def serve_stdio(server):
+    loop = asyncio.get_running_loop()
+
+    def write(line):
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+    async def readline():
+        # stdin is read in a thread, it cannot be used with the event loop on all platforms
+        return await loop.run_in_executor(None, sys.stdin.readline)
+
+    await server.serve(readline, write)
+
+
+async def serve_socket(server, host=None, port=None, path=None):
+    """ accept connections on tcp host and port, or on the unix socket path """
+    async def handle_connection(reader, writer):
+        async def readline():
+            return (await reader.readline()).decode()
+
+        def write(line):
+            writer.write((line + "\n").encode())
+
+        try:
+            await server.serve(readline, write)
+        finally:
+            writer.close()
+
+    if path is not None:
+        socket_server = await asyncio.start_unix_server(handle_connection, path)
+    else:
+        socket_server = await asyncio.start_server(handle_connection, host, port)
+    async with socket_server:
+        await socket_server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="quantik engine server with a line protocol")
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument("--tcp", help="listen on host:port instead of stdin and stdout")
+    transport.add_argument("--unix", help="listen on this unix socket path instead of stdin and stdout")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument("--max-searches", type=int, default=None,
+                        help="searches running or waiting at a time, 4 per worker by default")
+    args = parser.parse_args(argv)
+
+    server = EngineServer(args.workers, args.max_searches)
+    try:
+        if args.tcp:
+            host, _, port = args.tcp.rpartition(":")
+            asyncio.run(serve_socket(server, host or None, int(port)))
+        elif args.unix:
+            asyncio.run(serve_socket(server, path=args.unix))
+        else:
+            asyncio.run(serve_stdio(server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
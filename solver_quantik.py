@@ -0,0 +1,93 @@
+import argparse
+import sys
+import time
+from game_quantik import QuantikBoard, parse_move
+from symmetry_quantik import canonical_code
+from tablebase_quantik import (WIN, LOSS, DRAW, OUTCOME_BEFORE_MOVE, PositionTable, outcome_score,
+                               pack_value, unpack_value, write_tablebase)
+"""
+offline solver: exhaustive search of all positions reachable from a start position
+(the empty board by default), positions equal up to symmetry are solved once.
+the results are written as tablebase file, see tablebase_quantik.py.
+results are held in memory in a PositionTable (16 bytes per position). with --store-moves n,
+only positions with at most n moves played are kept for the tablebase, deeper positions are kept
+in a cache of bounded size (--cache-entries), so an opening table needs memory for the opening
+positions only. the time still grows with the whole game tree below the start position: solving
+the full game from the empty board is far out of reach of this solver, use --moves to start from
+a later position
+
+usage: python solver_quantik.py quantik.qtb [--moves 00C 11H ...] [--store-moves 6]
+"""
+
+
+def solve(board, results, cache=None, store_moves=None):
+    """ value byte (outcome and distance) of the position for the player to move.
+    all non terminal positions below board are solved and stored in results by canonical code,
+    with store_moves only those with at most store_moves moves played, deeper ones in cache """
+    code = canonical_code(board)
+    if cache is not None and store_moves is not None and len(board.move_sequence) > store_moves:
+        table = cache
+    else:
+        table = results
+    value = table.get(code)
+    if value is not None:
+        return value
+    moves = board.reduce_possible_moves(board.get_possible_moves())
+    # the player to move cannot move, as in QuantikAI this is a draw
+    best_outcome, best_distance = DRAW, 0
+    best_score = None
+    for move in moves:
+        board.make_move(move)
+        if board.winner:
+            outcome, distance = WIN, 1
+        else:
+            child_outcome, child_distance = unpack_value(solve(board, results, cache, store_moves))
+            outcome = OUTCOME_BEFORE_MOVE[child_outcome]
+            distance = child_distance + 1
+        board.revert_last_move()
+        score = outcome_score(outcome, distance)
+        if best_score is None or score > best_score:
+            best_outcome, best_distance, best_score = outcome, distance, score
+            if outcome == WIN and distance == 1:
+                # no other move can be better than winning now
+                break
+    value = pack_value(best_outcome, best_distance)
+    table[code] = value
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="solve quantik and write a position tablebase")
+    parser.add_argument("output", help="path of the tablebase file to write")
+    parser.add_argument("--moves", nargs="*", default=[],
+                        help="moves to the start position, e.g. 00C 11H (field row, column and shape)")
+    parser.add_argument("--load-factor", type=float, default=0.5,
+                        help="ratio of used slots in the hash table of the file")
+    parser.add_argument("--store-moves", type=int, default=None,
+                        help="write only positions with at most this many moves played (all by default)")
+    parser.add_argument("--cache-entries", type=int, default=2**22,
+                        help="positions below --store-moves kept in memory to solve them only once")
+    args = parser.parse_args(argv)
+
+    board = QuantikBoard()
+    for text in args.moves:
+        move = parse_move(text)
+        if board.winner or move not in board.get_possible_moves():
+            parser.error("move %s is not possible" % text)
+        board.make_move(move)
+    if board.winner:
+        parser.error("game is already won at the start position")
+    start = time.perf_counter()
+    results = PositionTable()
+    cache = PositionTable(max_entries=args.cache_entries) if args.store_moves is not None else None
+    outcome, distance = unpack_value(solve(board, results, cache, args.store_moves))
+    n_slots = write_tablebase(args.output, results, args.load_factor)
+    print("start position: %s for %s in %d moves" % ({WIN: "win", LOSS: "loss", DRAW: "draw"}[outcome],
+                                                      board.player, distance))
+    print("%d positions solved in %.1f s, %d slots written to %s"
+          % (len(results), time.perf_counter() - start, n_slots, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+from itertools import permutations, product
+"""
+symmetries of the quantik board:
+all permutations of the fields that map rows, columns and squares onto rows, columns and squares.
+rows (and columns) can be swapped within the top and bottom half, the two halfs can be swapped
+and the board can be transposed, giving 2*8*8 = 128 field permutations (rotations and reflections
+are among them). combined with any relabelling of the four shape names, they leave the game unchanged.
+fields are enumerated as in QuantikBoard.fields
+"""
+FIELDS = tuple(product(range(4), range(4)))
+FIELD_INDEX = {f: i for i, f in enumerate(FIELDS)}
+
+
+def _half_preserving_permutations():
+    """ permutations of 0..3 that map the pairs {0,1} and {2,3} onto each other """
+    return [p for p in permutations(range(4))
+            if {frozenset(p[:2]), frozenset(p[2:])} == {frozenset((0, 1)), frozenset((2, 3))}]
+
+
+def _field_permutations():
+    """ for each symmetry a tuple, mapping index of a field to index of its image """
+    field_perms = []
+    for rows, cols, transpose in product(_half_preserving_permutations(),
+                                         _half_preserving_permutations(), (False, True)):
+        images = [(rows[x], cols[y]) for x, y in FIELDS]
+        if transpose:
+            images = [(y, x) for x, y in images]
+        field_perms.append(tuple(FIELD_INDEX[f] for f in images))
+    return field_perms
+
+
+def _mask_tables(field_perm):
+    """ lookup tables to map the low and high byte of a field mask to the mask of the image fields """
+    tables = []
+    for offset in (0, 8):
+        table = [0] * 256
+        for byte in range(1, 256):
+            # image of the byte without its lowest bit, plus image of the lowest bit
+            low_bit = byte & -byte
+            table[byte] = table[byte ^ low_bit] | 1 << field_perm[low_bit.bit_length() - 1 + offset]
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+FIELD_PERMUTATIONS = tuple(_field_permutations())
+MASK_TABLES = tuple(_mask_tables(p) for p in FIELD_PERMUTATIONS)
+# (white, black) occupancy masks -> indices of the field permutations that keep both in place,
+# filled as positions are seen. positions with the same occupied fields share the entry
+_occupancy_symmetries = {}
+OCCUPANCY_CACHE_MAX_ENTRIES = 2**18
+
+
+def occupancy_symmetries(w_all, b_all):
+    """ indices of the field permutations that map the white and the black occupied fields
+    onto themselves """
+    key = (w_all, b_all)
+    symmetries = _occupancy_symmetries.get(key)
+    if symmetries is None:
+        symmetries = tuple(k for k, (lo, hi) in enumerate(MASK_TABLES)
+                           if (lo[w_all & 255] | hi[w_all >> 8]) == w_all
+                           and (lo[b_all & 255] | hi[b_all >> 8]) == b_all)
+        if len(_occupancy_symmetries) >= OCCUPANCY_CACHE_MAX_ENTRIES:
+            _occupancy_symmetries.clear()
+        _occupancy_symmetries[key] = symmetries
+    return symmetries
+
+
+def _shape_pairs(board):
+    """ per shape, the masks of white and black tokens of that shape """
+    w_masks, b_masks = board.shape_masks["w"], board.shape_masks["b"]
+    return [(w_masks[s], b_masks[s]) for s in board.tokens]
+
+
+def canonical_key(board):
+    """ key that is equal for two positions if and only if they are mapped onto each other by a
+    symmetry of the board and a relabelling of the shapes.
+    for each field permutation, relabelling is taken care of by sorting the (white, black) mask pairs
+    of the shapes, the key is the smallest of those over all field permutations. field permutations
+    that do not give the smallest occupancy masks are discarded before sorting """
+    pairs = _shape_pairs(board)
+    w_all = b_all = 0
+    for w, b in pairs:
+        w_all |= w
+        b_all |= b
+    best_occupancy = None
+    candidates = []
+    for lo, hi in MASK_TABLES:
+        occupancy = (lo[w_all & 255] | hi[w_all >> 8], lo[b_all & 255] | hi[b_all >> 8])
+        if best_occupancy is None or occupancy < best_occupancy:
+            best_occupancy = occupancy
+            candidates = [(lo, hi)]
+        elif occupancy == best_occupancy:
+            candidates.append((lo, hi))
+    return min(tuple(sorted((lo[w & 255] | hi[w >> 8], lo[b & 255] | hi[b >> 8]) for w, b in pairs))
+               for lo, hi in candidates)
+
+
+def canonical_code(board):
+    """ canonical_key packed into one int below 9**16: each field is a base 9 digit,
+    0 for a free field, 1 + rank of the shape in the key for white, 5 + rank for black """
+    code = 0
+    for rank, (w, b) in enumerate(canonical_key(board)):
+        for i in range(16):
+            if w >> i & 1:
+                code += (1 + rank) * 9**i
+            elif b >> i & 1:
+                code += (5 + rank) * 9**i
+    return code
+
+
+def position_symmetries(board):
+    """ the field permutations that map the position onto itself up to relabelling of shapes,
+    each given as index in FIELD_PERMUTATIONS with the image (white, black) mask pair of every shape """
+    pairs = _shape_pairs(board)
+    sorted_pairs = sorted(pairs)
+    symmetries = []
+    for k in occupancy_symmetries(board.player_masks["w"], board.player_masks["b"]):
+        lo, hi = MASK_TABLES[k]
+        image_pairs = [(lo[w & 255] | hi[w >> 8], lo[b & 255] | hi[b >> 8]) for w, b in pairs]
+        if sorted(image_pairs) == sorted_pairs:
+            symmetries.append((k, image_pairs))
+    return symmetries
+
+
+def reduce_moves(board, moves):
+    """ keep one move (the first one in the given order) of each class of equivalent moves.
+    two moves are equivalent if a symmetry of the current position maps one onto the other, the
+    resulting child positions are then equal up to symmetry. moves of shapes with identical
+    placement (e.g. shapes not played yet) are equivalent as well """
+    symmetries = position_symmetries(board)
+    pairs = _shape_pairs(board)
+    shape_index = {s: i for i, s in enumerate(board.tokens)}
+    # moves are identified by field index and placement of their shape,
+    # seen holds the whole class of each move kept
+    seen = set()
+    reduced_moves = []
+    for move in moves:
+        field, token = move
+        f, t = FIELD_INDEX[field], shape_index[token]
+        if (f, pairs[t]) in seen:
+            continue
+        seen.update((FIELD_PERMUTATIONS[k][f], image_pairs[t]) for k, image_pairs in symmetries)
+        reduced_moves.append(move)
+    return reduced_moves
+
+
+def equivalent_moves(board, move):
+    """ the moves equivalent to move (see reduce_moves), move included, each with a symmetry
+    mapping the position after move onto the position after the equivalent move. a symmetry is
+    given as field permutation and relabelling of the shapes, see apply_symmetry """
+    symmetries = position_symmetries(board)
+    pairs = _shape_pairs(board)
+    shapes = board.tokens
+    field, token = move
+    f, t = FIELD_INDEX[field], shapes.index(token)
+    equivalents = {}
+    for k, image_pairs in symmetries:
+        field_perm = FIELD_PERMUTATIONS[k]
+        # the shape of move can become any shape with the same placement as the image of its own
+        for u in range(len(shapes)):
+            image = (FIELDS[field_perm[f]], shapes[u])
+            if pairs[u] != image_pairs[t] or image in equivalents:
+                continue
+            # the other shapes are relabelled to the remaining shapes with their image placement
+            remaining = [s for s in range(len(shapes)) if s != u]
+            relabelling = {token: shapes[u]}
+            for s in range(len(shapes)):
+                if s != t:
+                    r = next(r for r in remaining if pairs[r] == image_pairs[s])
+                    remaining.remove(r)
+                    relabelling[shapes[s]] = shapes[r]
+            equivalents[image] = (field_perm, relabelling)
+    return equivalents
+
+
+def apply_symmetry(symmetry, move):
+    """ image of move under a symmetry of equivalent_moves """
+    field_perm, relabelling = symmetry
+    field, token = move
+    return FIELDS[field_perm[FIELD_INDEX[field]]], relabelling[token]
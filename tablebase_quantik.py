@@ -0,0 +1,170 @@
+import mmap
+import struct
+import sys
+from array import array
+from symmetry_quantik import canonical_code
+"""
+file format of the position tablebase written by solver_quantik.py:
+a header (magic, format version, number of slots), followed by an open addressing hash table
+of 8 byte little endian slots. a slot holds (canonical_code + 1) << 8 | value, 0 for an empty slot,
+the slot of a position is found by linear probing from the hash of its canonical code.
+value holds the outcome for the player to move in the upper two bits and the number of moves
+until the end of the game with best play in the lower five bits
+"""
+MAGIC = b"QTKB"
+VERSION = 1
+HEADER = struct.Struct("<4sIQ")
+SLOT = struct.Struct("<Q")
+
+# outcomes for the player to move
+WIN, LOSS, DRAW = 1, 2, 3
+# outcome for the player who made the move leading to a position
+OUTCOME_BEFORE_MOVE = {WIN: LOSS, LOSS: WIN, DRAW: DRAW}
+
+
+def outcome_score(outcome, distance):
+    """ ordering of outcomes for the player to move: fast wins first, slow losses before fast ones """
+    if outcome == WIN:
+        return 100 - distance
+    elif outcome == DRAW:
+        return 0
+    return distance - 100
+
+
+def pack_value(outcome, distance):
+    return outcome << 6 | distance
+
+
+def unpack_value(value):
+    """ outcome and distance of a value byte """
+    return value >> 6, value & 31
+
+
+def _home_slot(code, n_slots):
+    return (code * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF) % n_slots
+
+
+def write_tablebase(path, results, load_factor=0.5):
+    """ write results, a dict or PositionTable from canonical code to value byte, as tablebase file """
+    n_slots = max(1, int(len(results) / load_factor) + 1)
+    slots = array("Q", bytes(SLOT.size * n_slots))
+    for code, value in results.items():
+        slot = _home_slot(code, n_slots)
+        while slots[slot]:
+            slot = (slot + 1) % n_slots
+        slots[slot] = (code + 1) << 8 | value
+    if sys.byteorder != "little":
+        slots.byteswap()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n_slots))
+        slots.tofile(f)
+    return n_slots
+
+
+class PositionTable():
+    """ in memory table from canonical code to value byte, an open addressing hash table with the
+    slots of the tablebase file in an array, 16 bytes per position at load factor 0.5 instead of
+    over 100 in a dict. grows when more than load_factor of the slots are used. with max_entries,
+    the table is a cache and is cleared when it is full """
+
+    def __init__(self, load_factor=0.5, max_entries=None):
+        self.load_factor = load_factor
+        self.max_entries = max_entries
+        self.clear()
+
+    def clear(self):
+        self._slots = array("Q", bytes(SLOT.size * 1024))
+        self._n_entries = 0
+
+    def __len__(self):
+        return self._n_entries
+
+    def get(self, code):
+        """ value byte of the position with canonical code, None if not in the table """
+        slots = self._slots
+        n_slots = len(slots)
+        slot = _home_slot(code, n_slots)
+        tag = code + 1
+        while True:
+            entry = slots[slot]
+            if entry == 0:
+                return None
+            if entry >> 8 == tag:
+                return entry & 255
+            slot = (slot + 1) % n_slots
+
+    def __setitem__(self, code, value):
+        if self.max_entries is not None and self._n_entries >= self.max_entries:
+            self.clear()
+        if self._n_entries + 1 > self.load_factor * len(self._slots):
+            self._resize(2 * len(self._slots))
+        self._insert((code + 1) << 8 | value)
+
+    def _insert(self, new_entry):
+        slots = self._slots
+        n_slots = len(slots)
+        slot = _home_slot((new_entry >> 8) - 1, n_slots)
+        while slots[slot]:
+            if slots[slot] >> 8 == new_entry >> 8:
+                slots[slot] = new_entry
+                return
+            slot = (slot + 1) % n_slots
+        slots[slot] = new_entry
+        self._n_entries += 1
+
+    def _resize(self, n_slots):
+        old_slots = self._slots
+        self._slots = array("Q", bytes(SLOT.size * n_slots))
+        self._n_entries = 0
+        for entry in old_slots:
+            if entry:
+                self._insert(entry)
+
+    def items(self):
+        """ (canonical code, value byte) of all positions """
+        for entry in self._slots:
+            if entry:
+                yield (entry >> 8) - 1, entry & 255
+
+
+class Tablebase():
+    """ read access to a tablebase file, memory mapped on first probe """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        self._n_slots = None
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_slots = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a quantik tablebase of version %d" % (self.path, VERSION))
+        self._n_slots = n_slots
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def probe_code(self, code):
+        """ value byte of the position with canonical code, None if not in the table """
+        if self._mmap is None:
+            self._open()
+        slot = _home_slot(code, self._n_slots)
+        tag = code + 1
+        while True:
+            entry, = SLOT.unpack_from(self._mmap, HEADER.size + SLOT.size * slot)
+            if entry == 0:
+                return None
+            if entry >> 8 == tag:
+                return entry & 255
+            slot = (slot + 1) % self._n_slots
+
+    def probe(self, board):
+        """ outcome and distance for the player to move, None if position is not in the table """
+        value = self.probe_code(canonical_code(board))
+        if value is None:
+            return None
+        return unpack_value(value)
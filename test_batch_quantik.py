@@ -0,0 +1,22 @@
+import pytest
+from game_quantik import QuantikBoard
+pytest.importorskip("numpy")
+from batch_quantik import BatchQuantik, move_sequences
+"""
+games of the numpy batch simulator replayed on QuantikBoard
+"""
+
+
+@pytest.mark.parametrize("policy", ["random", "greedy"])
+def test_batch_games_are_legal(policy):
+    winners, moves = BatchQuantik(200, seed=0).play(policy, policy)
+    for winner, move_sequence in zip(winners, move_sequences(moves)):
+        board = QuantikBoard(verbose_output=False)
+        for move in move_sequence:
+            assert not board.winner
+            assert move in board.get_possible_moves()
+            board.make_move(move)
+        if winner == "draw":
+            assert not board.winner and not board.get_possible_moves()
+        else:
+            assert board.winner == winner
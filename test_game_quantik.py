@@ -0,0 +1,301 @@
+import io
+import json
+import random
+import time
+import pytest
+from game_quantik import (FIELDS, SPACES, TOKENS, QuantikAI, QuantikBoard, decode_move, encode_move,
+                          format_move, parse_move)
+"""
+rules, encodings and search of game_quantik.py, checked against plain implementations
+"""
+
+
+def random_board(n_moves, rng, cls=QuantikBoard):
+    """ board after up to n_moves random moves, fewer if the game ends before """
+    board = cls(verbose_output=False)
+    for _ in range(n_moves):
+        moves = sorted(board.get_possible_moves())
+        if board.winner or not moves:
+            break
+        board.make_move(rng.choice(moves))
+    return board
+
+
+def naive_possible_moves(move_sequence, player):
+    """ moves by the rules: a free field, a shape the player has left and that the opponent
+    has not placed in a row, column or square of the field """
+    placed = {}
+    counts = {}
+    for i, (field, token) in enumerate(move_sequence):
+        placed[field] = ("wb"[i % 2], token)
+        counts[("wb"[i % 2], token)] = counts.get(("wb"[i % 2], token), 0) + 1
+    moves = set()
+    for field in FIELDS:
+        if field in placed:
+            continue
+        for token in TOKENS:
+            if counts.get((player, token), 0) >= 2:
+                continue
+            if any(field in space and placed.get(f, (None,))[0] not in (None, player)
+                   and placed[f][1] == token for space in SPACES for f in space):
+                continue
+            moves.add((field, token))
+    return moves
+
+
+def naive_winner(move_sequence):
+    """ True if a space holds all four shapes """
+    shapes = {field: token for field, token in move_sequence}
+    return any(len({shapes.get(f) for f in space} - {None}) == 4 for space in SPACES)
+
+
+def plain_minimax(board, cache):
+    """ value for the player to move by exhaustive search: 1 win, -1 loss, 0 draw """
+    key = board.position_key()
+    if key not in cache:
+        value = 0 if not board.get_possible_moves() else -1
+        for move in board.get_possible_moves():
+            board.make_move(move)
+            move_value = 1 if board.winner else -plain_minimax(board, cache)
+            board.revert_last_move()
+            value = max(value, move_value)
+            if value == 1:
+                break
+        cache[key] = value
+    return cache[key]
+
+
+def test_moves_and_wins_follow_the_rules():
+    rng = random.Random(1)
+    for _ in range(100):
+        board = QuantikBoard(verbose_output=False)
+        while True:
+            moves = board.get_possible_moves()
+            assert len(moves) == len(set(moves))
+            assert set(moves) == naive_possible_moves(board.move_sequence, board.player)
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+            assert bool(board.winner) == naive_winner(board.move_sequence) == board.game_is_won()
+            if board.winner:
+                break
+
+
+def test_revert_restores_position():
+    rng = random.Random(2)
+    for _ in range(50):
+        board = random_board(16, rng)
+        while board.move_sequence:
+            key, zobrist = board.position_key(), board.zobrist_key
+            move = board.move_sequence[-1]
+            board.revert_last_move()
+            board.make_move(move)
+            assert (board.position_key(), board.zobrist_key) == (key, zobrist)
+            board.revert_last_move()
+        assert board.position_key() == 0
+        assert board.zobrist_key == 0
+        assert board.space_shape_masks == [0] * len(SPACES)
+
+
+def test_winning_moves_and_move_order():
+    rng = random.Random(8)
+    for _ in range(100):
+        board = random_board(rng.randint(3, 12), rng, cls=QuantikAI)
+        if board.winner:
+            continue
+        moves = board.get_possible_moves(shuffle=True)
+        wins = {m for m in moves if naive_winner(board.move_sequence + [m])}
+        assert board.winning_moves() & set(moves) == wins
+        killers = [m for m in moves if m not in wins][:2]
+        board.killer_moves = {3: killers}
+        ordered = board.order_moves(moves, depth=3)
+        assert sorted(ordered) == sorted(moves)
+        assert set(ordered[:len(wins)]) == wins
+        assert ordered[len(wins):len(wins) + len(killers)] == [m for m in moves if m in killers]
+
+
+def test_move_encodings_round_trip():
+    for field in FIELDS:
+        for token in TOKENS:
+            move = (field, token)
+            assert decode_move(encode_move(move)) == move
+            assert parse_move(format_move(move)) == move
+    assert len({encode_move((f, t)) for f in FIELDS for t in TOKENS}) == 64
+
+
+def test_position_encodings_round_trip():
+    rng = random.Random(3)
+    for _ in range(100):
+        board = random_board(rng.randint(0, 16), rng)
+        key = board.position_key()
+        for copy in (QuantikBoard.from_key(key, verbose_output=False),
+                     QuantikBoard.from_bytes(board.to_bytes(), verbose_output=False)):
+            assert copy.position_key() == key
+            assert copy.player == board.player
+            assert copy.winner == board.winner
+            assert copy.zobrist_key == board.zobrist_key
+            assert sorted(copy.get_possible_moves()) == sorted(board.get_possible_moves())
+
+
+@pytest.mark.parametrize("key", [-1, 9, 15 << 60, 1 << 64, 1 << 70])
+def test_invalid_position_key(key):
+    with pytest.raises(ValueError):
+        QuantikBoard.from_key(key, verbose_output=False)
+
+
+@pytest.mark.parametrize("data", [b"", bytes(7), bytes(9)])
+def test_invalid_position_bytes(data):
+    with pytest.raises(ValueError):
+        QuantikBoard.from_bytes(data, verbose_output=False)
+
+
+@pytest.mark.parametrize("endgame_free_fields", [0, 9])
+def test_search_value_matches_plain_minimax(endgame_free_fields):
+    rng = random.Random(4)
+    cache = {}
+    n_checked = 0
+    while n_checked < 25:
+        board = random_board(rng.randint(6, 10), rng, cls=QuantikAI)
+        if board.winner or not board.get_possible_moves():
+            continue
+        board.endgame_free_fields = endgame_free_fields
+        result = board.analyse(depth=16)
+        assert result["value"] == plain_minimax(board, cache)
+        assert result["depth"] is not None
+        # the best move reaches the value
+        board.make_move(result["move"])
+        move_value = 1 if board.winner else -plain_minimax(board, cache)
+        board.revert_last_move()
+        assert move_value == result["value"]
+        n_checked += 1
+
+
+def test_endgame_solver_matches_plain_minimax():
+    rng = random.Random(5)
+    cache = {}
+    n_checked = 0
+    while n_checked < 50:
+        board = random_board(rng.randint(7, 12), rng, cls=QuantikAI)
+        if board.winner:
+            continue
+        assert board.solve_endgame() == plain_minimax(board, cache)
+        n_checked += 1
+
+
+def test_node_budget_plays_move_of_last_completed_iteration():
+    board = QuantikAI(verbose_output=False, collect_stats=True)
+    for text in ["00C", "11H", "22S"]:
+        board.make_move(parse_move(text))
+    board.minimax_move(node_budget=3000)
+    stats = board.last_search_stats
+    # the search stops at the first node over the budget
+    assert board._search_nodes <= 3001
+    assert stats.iterations[-1]["move"] == format_move(board.move_sequence[-1])
+    assert [it["depth"] for it in stats.iterations] == list(range(len(stats.iterations)))
+
+
+def test_deepening_stops_at_proven_value():
+    rng = random.Random(7)
+    n_checked = 0
+    while n_checked < 5:
+        board = random_board(rng.randint(3, 6), rng, cls=QuantikAI)
+        if board.winner or not board.get_possible_moves():
+            continue
+        board.collect_stats = True
+        result = board.analyse(node_budget=10**6)
+        iterations = board.last_search_stats.iterations
+        assert all(abs(it["value"]) < 1 for it in iterations[:-1])
+        if abs(result["value"]) >= 1:
+            assert result["depth"] == iterations[-1]["depth"]
+            n_checked += 1
+
+
+def test_time_budget_is_kept():
+    board = QuantikAI(verbose_output=False)
+    for text in ["00C", "11H", "22S"]:
+        board.make_move(parse_move(text))
+    start = time.perf_counter()
+    board.minimax_move(time_budget=0.3)
+    # the search stops at the first node after the deadline
+    assert time.perf_counter() - start < 0.3 + 0.2
+    assert len(board.move_sequence) == 4
+
+
+def test_analyse_rejects_negative_depth():
+    with pytest.raises(ValueError):
+        QuantikAI(verbose_output=False).analyse(depth=-1)
+
+
+@pytest.mark.parametrize("depth", [0, 2])
+def test_analyse_counts_all_nodes(depth):
+    board = QuantikAI(verbose_output=False, collect_stats=True)
+    for text in ["00C", "11H", "22S"]:
+        board.make_move(parse_move(text))
+    result = board.analyse(depth=depth)
+    assert result["nodes"] == board.last_search_stats.nodes > 0
+
+
+def test_analyse_is_not_traced_as_move():
+    trace = io.StringIO()
+    board = QuantikAI(verbose_output=False, trace_file=trace)
+    events = []
+    board.search_hooks.append(lambda event, stats: events.append(event))
+    for text in ["00C", "11H", "22S"]:
+        board.make_move(parse_move(text))
+    board.analyse(depth=2)
+    assert board.last_search_stats is not None
+    assert set(events) == {"iteration"} and trace.getvalue() == ""
+    board.minimax_move(node_budget=1000)
+    assert events.count("move") == 1
+    assert json.loads(trace.getvalue())["move"] == format_move(board.move_sequence[-1])
+
+
+def test_unknown_ai_method():
+    with pytest.raises(ValueError):
+        QuantikAI(verbose_output=False).make_AI_move("minmax")
+
+
+def test_parallel_search_matches_serial_search():
+    rng = random.Random(6)
+    n_checked = 0
+    while n_checked < 3:
+        board = random_board(rng.randint(3, 4), rng, cls=QuantikAI)
+        # without an immediate win, so there are iterations to compare
+        if board.winner or board.winning_moves() & set(board.get_possible_moves()):
+            continue
+        serial = QuantikAI(verbose_output=False)
+        parallel = QuantikAI(verbose_output=False, n_workers=2)
+        for move in board.move_sequence:
+            serial.make_move(move)
+            parallel.make_move(move)
+        try:
+            _, serial_value, serial_depth = serial._iterative_deepening(5, None, None, parallel=False)
+            _, parallel_value, parallel_depth = parallel._iterative_deepening(5, None, None, parallel=True)
+        finally:
+            parallel.close()
+        assert (parallel_value, parallel_depth) == (serial_value, serial_depth)
+        n_checked += 1
+
+
+def test_parallel_search_keeps_node_budget():
+    board = QuantikAI(verbose_output=False, n_workers=2)
+    for text in ["00C", "11H", "22S"]:
+        board.make_move(parse_move(text))
+    try:
+        board.minimax_move(node_budget=20000, parallel=True)
+    finally:
+        board.close()
+    # the workers share the budget, each process stops at the first node over it
+    assert board._search_nodes <= 20000 + 3
+
+
+def test_parallel_search_stats_include_workers():
+    board = QuantikAI(verbose_output=False, n_workers=2, collect_stats=True)
+    for text in ["00C", "11H", "22S"]:
+        board.make_move(parse_move(text))
+    try:
+        board.minimax_move(node_budget=20000, parallel=True)
+    finally:
+        board.close()
+    # the node over the budget, where a process stops, is not in the statistics
+    assert board._search_nodes - 3 <= board.last_search_stats.nodes <= board._search_nodes
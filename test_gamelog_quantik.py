@@ -0,0 +1,61 @@
+import random
+from game_quantik import QuantikBoard
+from gamelog_quantik import HEADER, RECORD_SIZE, GameLogReader, GameLogWriter, pack_game, unpack_game
+"""
+round trips of games through the binary game log
+"""
+
+
+def random_game(rng):
+    board = QuantikBoard(verbose_output=False)
+    while not board.winner:
+        moves = sorted(board.get_possible_moves())
+        if not moves:
+            board.winner = "draw"
+            break
+        board.make_move(rng.choice(moves))
+    return list(board.move_sequence), board.winner
+
+
+def test_records_round_trip():
+    rng = random.Random(0)
+    for _ in range(200):
+        moves, winner = random_game(rng)
+        record = pack_game(moves, winner)
+        assert len(record) == RECORD_SIZE
+        assert unpack_game(record) == (moves, winner)
+
+
+def test_log_round_trip_and_append(tmp_path):
+    path = str(tmp_path / "games.qlog")
+    rng = random.Random(1)
+    games = [random_game(rng) for _ in range(20)]
+    with GameLogWriter(path) as writer:
+        for moves, winner in games[:10]:
+            writer.write(moves, winner)
+    with GameLogWriter(path) as writer:
+        for moves, winner in games[10:]:
+            writer.write(moves, winner)
+    with GameLogReader(path) as reader:
+        assert len(reader) == 20
+        assert list(reader) == games
+        assert reader[-1] == games[-1]
+
+
+def test_cut_off_record_is_dropped(tmp_path):
+    path = str(tmp_path / "games.qlog")
+    rng = random.Random(2)
+    games = [random_game(rng) for _ in range(3)]
+    with GameLogWriter(path) as writer:
+        for moves, winner in games[:2]:
+            writer.write(moves, winner)
+    with open(path, "ab") as f:
+        f.write(pack_game(*games[2])[:5])
+    with GameLogReader(path) as reader:
+        assert list(reader) == games[:2]
+    with GameLogWriter(path) as writer:
+        writer.write(*games[2])
+    with GameLogReader(path) as reader:
+        assert list(reader) == games
+    with open(path, "rb") as f:
+        assert len(f.read()) == HEADER.size + 3 * RECORD_SIZE
@@ -0,0 +1,51 @@
+import random
+from game_quantik import QuantikAI
+from test_game_quantik import random_board
+"""
+monte carlo tree search of mcts_quantik.py: budget, winning moves and reuse of the tree
+"""
+
+
+def test_iteration_budget_and_visit_counts():
+    random.seed(0)
+    board = QuantikAI(verbose_output=False)
+    board.mcts_move(iterations=300)
+    root = board.mcts_tree.root
+    assert root.visits == 300
+    # every iteration of a new root passes through one of its children
+    assert sum(board.last_mcts_visit_counts.values()) == root.visits
+    assert len(board.move_sequence) == 1
+
+
+def test_immediate_win_is_played():
+    rng = random.Random(1)
+    random.seed(1)
+    n_checked = 0
+    while n_checked < 10:
+        board = random_board(rng.randint(4, 10), rng, cls=QuantikAI)
+        if board.winner or not board.winning_moves() & set(board.get_possible_moves()):
+            continue
+        player = board.player
+        board.mcts_move(iterations=500)
+        assert board.winner == player
+        n_checked += 1
+
+
+def test_advance_keeps_subtree():
+    random.seed(2)
+    board = QuantikAI(verbose_output=False)
+    board.mcts_move(iterations=1000)
+    # the reply searched most often below the move played
+    node = board.mcts_tree.root.children[board.move_sequence[-1]]
+    reply = max(node.children.values(), key=lambda c: c.visits)
+    board.make_move(reply.move)
+    board.mcts_tree.advance(board.move_sequence)
+    root = board.mcts_tree.root
+    assert root is reply and root.parent is None
+    n_visits = root.visits
+    assert n_visits > 0
+    board.mcts_move(iterations=200)
+    assert board.mcts_tree.root is root
+    assert root.visits == n_visits + 200
+    # the iteration that added the root node did not reach any of its children
+    assert sum(board.last_mcts_visit_counts.values()) == root.visits - 1
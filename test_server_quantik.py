@@ -0,0 +1,69 @@
+import os
+import queue
+import subprocess
+import sys
+import threading
+import pytest
+"""
+round trips with the engine server over stdin and stdout, stdin stays open while waiting for replies
+"""
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server_quantik.py")
+TIMEOUT = 30
+
+
+@pytest.fixture
+def server():
+    process = subprocess.Popen([sys.executable, SERVER, "--workers", "1"], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, text=True, bufsize=1)
+    lines = queue.Queue()
+    reader = threading.Thread(target=lambda: [lines.put(line.strip()) for line in process.stdout],
+                              daemon=True)
+    reader.start()
+
+    def send(*commands):
+        for command in commands:
+            process.stdin.write(command + "\n")
+        process.stdin.flush()
+
+    def reply():
+        return lines.get(timeout=TIMEOUT)
+
+    yield send, reply
+    process.kill()
+    process.wait()
+
+
+def test_go_replies_bestmove_with_stdin_open(server):
+    send, reply = server
+    send("new g1", "position g1 00C 11H 22S", "go g1 depth 2")
+    assert reply() == "ok g1"
+    assert reply() == "ok g1"
+    assert reply().startswith("bestmove g1 ")
+
+
+def test_stop_ends_search(server):
+    send, reply = server
+    send("new g1", "go g1 time 100")
+    assert reply() == "ok g1"
+    send("stop g1")
+    assert reply().startswith("bestmove g1 ")
+
+
+def test_invalid_commands_reply_errors(server):
+    send, reply = server
+    send("new g1", "go g1 depth -1", "go g1 time nan", "go g1 time inf", "position g1 00C 00H", "isready")
+    assert reply() == "ok g1"
+    assert reply() == "error invalid depth -1"
+    assert reply() == "error invalid time nan"
+    assert reply() == "error invalid time inf"
+    assert reply() == "error move 00H is not possible"
+    assert reply() == "readyok"
+
+
+def test_game_over_position(server):
+    send, reply = server
+    # white completes the first row with all four shapes
+    send("new g1", "position g1 00C 33C 01S 32S 02T 31T 03H", "go g1")
+    assert reply() == "ok g1"
+    assert reply() == "ok g1"
+    assert reply() == "bestmove g1 none winner w"
@@ -0,0 +1,76 @@
+import random
+from game_quantik import QuantikBoard, parse_move
+from solver_quantik import solve
+from tablebase_quantik import DRAW, LOSS, WIN, PositionTable, Tablebase, unpack_value, write_tablebase
+from test_game_quantik import naive_winner, plain_minimax
+"""
+solver and tablebase against plain minimax
+"""
+OUTCOME_VALUES = {WIN: 1, DRAW: 0, LOSS: -1}
+START = ["30H", "01H", "33C", "10T", "22S", "02C", "13S"]
+
+
+def start_board():
+    board = QuantikBoard(verbose_output=False)
+    for text in START:
+        board.make_move(parse_move(text))
+    return board
+
+
+def test_position_table():
+    rng = random.Random(0)
+    table = PositionTable()
+    expected = {}
+    for _ in range(5000):
+        code, value = rng.getrandbits(50), rng.getrandbits(8)
+        table[code] = value
+        expected[code] = value
+    assert len(table) == len(expected)
+    assert all(table.get(code) == value for code, value in expected.items())
+    assert dict(table.items()) == expected
+    assert table.get(1 << 51) is None
+    cache = PositionTable(max_entries=10)
+    for code in range(25):
+        cache[code] = 1
+    assert len(cache) <= 10
+
+
+def test_solved_values_match_plain_minimax(tmp_path):
+    board = start_board()
+    results = PositionTable()
+    solve(board, results)
+    path = str(tmp_path / "late.qtb")
+    write_tablebase(path, results)
+    tablebase = Tablebase(path)
+    cache = {}
+    rng = random.Random(1)
+    # random walks below the start position. a position is in the table with its value, unless a
+    # player on the way missed a win at once, the solver does not search the other moves then
+    n_probed = 0
+    for _ in range(30):
+        board = start_board()
+        missed_win = False
+        while not board.winner and board.get_possible_moves():
+            result = tablebase.probe(board)
+            if result is None:
+                assert missed_win
+            else:
+                assert OUTCOME_VALUES[result[0]] == plain_minimax(board, cache)
+                n_probed += 1
+            moves = board.get_possible_moves()
+            move = rng.choice(moves)
+            missed_win |= (not naive_winner(board.move_sequence + [move])
+                           and any(naive_winner(board.move_sequence + [m]) for m in moves))
+            board.make_move(move)
+    assert n_probed > 60
+    tablebase.close()
+
+
+def test_store_moves_keeps_opening_positions_only():
+    board = start_board()
+    results, cache = PositionTable(), PositionTable(max_entries=1000)
+    value = solve(board, results, cache, store_moves=len(START) + 1)
+    full = PositionTable()
+    assert unpack_value(solve(start_board(), full))[0] == unpack_value(value)[0]
+    assert 1 < len(results) < len(full)
+    assert all(full.get(code) is not None for code, _ in results.items())
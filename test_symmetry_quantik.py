@@ -0,0 +1,131 @@
+import random
+from itertools import permutations
+from game_quantik import SPACES, TOKENS, QuantikBoard
+from symmetry_quantik import (FIELD_INDEX, FIELD_PERMUTATIONS, FIELDS, apply_symmetry, canonical_code,
+                              canonical_key, equivalent_moves, reduce_moves)
+from test_game_quantik import random_board
+"""
+soundness of the board symmetries: the group, canonical keys, move reduction and the mapping
+of equivalent moves
+"""
+SPACE_SETS = {frozenset(FIELD_INDEX[f] for f in space) for space in SPACES}
+
+
+def mapped_board(board, field_perm, relabelling):
+    """ board with the moves of board mapped by a field permutation and a relabelling of shapes """
+    image = QuantikBoard(verbose_output=False)
+    for field, token in board.move_sequence:
+        image.make_move((FIELDS[field_perm[FIELD_INDEX[field]]], relabelling[token]))
+    return image
+
+
+def child_keys(board, moves):
+    keys = []
+    for move in moves:
+        board.make_move(move)
+        keys.append(canonical_key(board))
+        board.revert_last_move()
+    return keys
+
+
+def test_field_permutations_form_the_symmetry_group():
+    assert len(FIELD_PERMUTATIONS) == len(set(FIELD_PERMUTATIONS)) == 128
+    for perm in FIELD_PERMUTATIONS:
+        assert {frozenset(perm[f] for f in space) for space in SPACE_SETS} == SPACE_SETS
+    group = set(FIELD_PERMUTATIONS)
+    rng = random.Random(0)
+    for _ in range(500):
+        p, q = rng.choice(FIELD_PERMUTATIONS), rng.choice(FIELD_PERMUTATIONS)
+        assert tuple(p[q[f]] for f in range(16)) in group
+
+
+def test_canonical_key_is_invariant():
+    rng = random.Random(1)
+    for _ in range(200):
+        board = random_board(rng.randint(0, 10), rng)
+        perm = rng.choice(FIELD_PERMUTATIONS)
+        relabelling = dict(zip(TOKENS, rng.choice(list(permutations(TOKENS)))))
+        image = mapped_board(board, perm, relabelling)
+        assert canonical_key(image) == canonical_key(board)
+        assert canonical_code(image) == canonical_code(board)
+
+
+def placement(board):
+    return {(FIELD_INDEX[field], "wb"[i % 2], token) for i, (field, token) in enumerate(board.move_sequence)}
+
+
+def equivalent_by_search(a, b):
+    """ whether some field permutation and relabelling of shapes maps a onto b """
+    target = placement(b)
+    for perm in FIELD_PERMUTATIONS:
+        for labels in permutations(TOKENS):
+            relabelling = dict(zip(TOKENS, labels))
+            if {(perm[f], p, relabelling[t]) for f, p, t in placement(a)} == target:
+                return True
+    return False
+
+
+def test_canonical_key_equal_only_for_equivalent_positions():
+    # children of one position are often, but not always, equivalent
+    rng = random.Random(2)
+    for _ in range(12):
+        board = random_board(rng.randint(1, 6), rng)
+        if board.winner:
+            continue
+        children = []
+        for move in rng.sample(board.get_possible_moves(), 8):
+            child = QuantikBoard(verbose_output=False)
+            for m in board.move_sequence + [move]:
+                child.make_move(m)
+            children.append(child)
+        for a, b in zip(children, children[1:]):
+            assert (canonical_key(a) == canonical_key(b)) == equivalent_by_search(a, b)
+
+
+def test_reduced_moves_cover_each_class_once():
+    rng = random.Random(3)
+    for _ in range(150):
+        board = random_board(rng.randint(0, 9), rng)
+        if board.winner:
+            continue
+        moves = board.get_possible_moves(shuffle=True)
+        reduced = reduce_moves(board, moves)
+        reduced_keys = child_keys(board, reduced)
+        assert len(set(reduced_keys)) == len(reduced_keys)
+        assert set(child_keys(board, moves)) == set(reduced_keys)
+        assert reduced == board.reduce_possible_moves(moves)
+
+
+def test_equivalent_moves_map_positions_and_replies():
+    rng = random.Random(4)
+    for _ in range(60):
+        board = random_board(rng.randint(0, 7), rng)
+        if board.winner:
+            continue
+        moves = board.get_possible_moves()
+        covered = set()
+        for move in reduce_moves(board, moves):
+            equivalents = equivalent_moves(board, move)
+            assert move in equivalents
+            covered |= set(equivalents)
+            board.make_move(move)
+            replies = [] if board.winner else board.get_possible_moves()
+            board.revert_last_move()
+            for equivalent, symmetry in equivalents.items():
+                board.make_move(equivalent)
+                assert sorted(apply_symmetry(symmetry, r) for r in replies) == sorted(
+                    [] if board.winner else board.get_possible_moves())
+                board.revert_last_move()
+                # the symmetry maps the position after move and a reply onto the one after the images
+                for reply in rng.sample(replies, min(3, len(replies))):
+                    board.make_move(move)
+                    board.make_move(reply)
+                    key, winner = canonical_key(board), board.winner
+                    board.revert_last_move()
+                    board.revert_last_move()
+                    board.make_move(equivalent)
+                    board.make_move(apply_symmetry(symmetry, reply))
+                    assert (canonical_key(board), board.winner) == (key, winner)
+                    board.revert_last_move()
+                    board.revert_last_move()
+        assert covered == set(moves)
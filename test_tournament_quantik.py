@@ -0,0 +1,37 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+import tournament_quantik
+from tournament_quantik import engine_options, register_engine, run_tournament
+"""
+tournament runner: engines resolved in the parent process, invalid engine names rejected
+"""
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """ ENGINES restored after the test """
+    monkeypatch.setattr(tournament_quantik, "ENGINES", dict(tournament_quantik.ENGINES))
+    return tournament_quantik.ENGINES
+
+
+def test_registered_engine_in_spawned_workers(engines, monkeypatch):
+    # spawned worker processes do not see engines registered in this process
+    context = multiprocessing.get_context("spawn")
+    monkeypatch.setattr(tournament_quantik, "ProcessPoolExecutor",
+                        lambda max_workers=None: ProcessPoolExecutor(max_workers=1, mp_context=context))
+    register_engine("minimax_fast", "minimax", time_budget=0.01)
+    records = run_tournament(["random", "minimax_fast"], 2)
+    assert [(r["w"], r["b"]) for r in records] == [("random", "minimax_fast"), ("minimax_fast", "random")]
+    assert all(r["winner"] in ("w", "b", "draw") for r in records)
+
+
+@pytest.mark.parametrize("name", ["minmax@0.1", "minimax@x", "minimax@nan", "minimax@0", "nothing"])
+def test_invalid_engine_names(name):
+    with pytest.raises(ValueError):
+        engine_options(name)
+
+
+def test_register_unknown_method(engines):
+    with pytest.raises(ValueError):
+        register_engine("broken", "minmax")
@@ -0,0 +1,216 @@
+import argparse
+import csv
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from game_quantik import AI_METHODS, QuantikAI, format_move, parse_move
+from gamelog_quantik import GameLogWriter
+"""
+headless self-play tournament: every pairing of engines plays a number of games, colours
+alternating, in worker processes with fixed seeds. reports win and draw rates, elo estimates and
+move time statistics as json and csv.
+an engine is a name in ENGINES, or method@seconds for a method of QuantikAI.make_AI_move
+with a time budget per move, e.g. minimax@0.5
+
+usage: python tournament_quantik.py random minimax minimax@0.5 --games 20 --json results.json
+"""
+# engine name -> arguments of QuantikAI.make_AI_move
+ENGINES = {"random": {"method": "random"},
+           "minimax": {"method": "minimax"},
+           "mcts": {"method": "mcts"},
+           }
+
+
+def register_engine(name, method, **options):
+    """ make an engine available by name, options are passed on to make_AI_move """
+    if method not in AI_METHODS:
+        raise ValueError("unknown AI method %r" % method)
+    ENGINES[name] = dict(method=method, **options)
+
+
+def engine_options(name):
+    if name in ENGINES:
+        return ENGINES[name]
+    method, _, budget = name.partition("@")
+    if not budget or method not in AI_METHODS:
+        raise ValueError("unknown engine %r" % name)
+    try:
+        time_budget = float(budget)
+    except ValueError:
+        raise ValueError("invalid time budget in engine %r" % name) from None
+    if not time_budget > 0 or math.isinf(time_budget):
+        raise ValueError("invalid time budget in engine %r" % name)
+    return {"method": method, "time_budget": time_budget}
+
+
+def play_game(engine_w, engine_b, seed, options_w=None, options_b=None):
+    """ play one game without output, returns a record with winner, moves and move times.
+    options_w and options_b are the make_AI_move arguments of the engines, looked up by name if
+    not given. the caller resolves them for worker processes, which may not share ENGINES """
+    random.seed(seed)
+    game = QuantikAI(verbose_output=False)
+    options = {"w": options_w or engine_options(engine_w), "b": options_b or engine_options(engine_b)}
+    move_times = {"w": [], "b": []}
+    while not game.winner:
+        player = game.player
+        n_moves = len(game.move_sequence)
+        start = time.perf_counter()
+        game.make_AI_move(**options[player])
+        if len(game.move_sequence) > n_moves:
+            move_times[player].append(time.perf_counter() - start)
+    game.close()
+    return {"w": engine_w, "b": engine_b, "seed": seed, "winner": game.winner,
+            "moves": [format_move(m) for m in game.move_sequence], "move_times": move_times}
+
+
+def elo_ratings(results, engines, n_iter=1000):
+    """ maximum likelihood elo ratings with mean 1500 from (engine, engine, score of first) results.
+    every pair of engines gets one virtual draw, so a perfect score gives a finite rating """
+    scores = {e: 0.0 for e in engines}
+    games = {pair: 0 for pair in combinations(engines, 2)}
+    for a, b, score in results:
+        scores[a] += score
+        scores[b] += 1 - score
+        games[(a, b) if (a, b) in games else (b, a)] += 1
+    for a, b in games:
+        scores[a] += 0.5
+        scores[b] += 0.5
+        games[(a, b)] += 1
+    # minorization maximization for the bradley terry model, strength = 10**(rating/400)
+    strength = {e: 1.0 for e in engines}
+    for _ in range(n_iter):
+        for e in engines:
+            denominator = sum(n / (strength[a] + strength[b])
+                              for (a, b), n in games.items() if e in (a, b))
+            strength[e] = scores[e] / denominator if denominator else strength[e]
+        mean_log = sum(math.log10(s) for s in strength.values()) / len(engines)
+        strength = {e: 10 ** (math.log10(s) - mean_log) for e, s in strength.items()}
+    return {e: 1500 + 400 * math.log10(s) for e, s in strength.items()}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(records, engines):
+    """ per pairing win and draw rates, per engine elo and move time statistics """
+    pairings = {}
+    elo_results = []
+    move_times = {e: [] for e in engines}
+    for r in records:
+        pair = tuple(sorted((r["w"], r["b"])))
+        stats = pairings.setdefault(pair, {"games": 0, "wins_" + pair[0]: 0, "wins_" + pair[1]: 0,
+                                           "draws": 0})
+        stats["games"] += 1
+        if r["winner"] == "draw":
+            stats["draws"] += 1
+            elo_results.append((r["w"], r["b"], 0.5))
+        else:
+            stats["wins_" + r[r["winner"]]] += 1
+            elo_results.append((r["w"], r["b"], 1.0 if r["winner"] == "w" else 0.0))
+        for player in ("w", "b"):
+            move_times[r[player]] += r["move_times"][player]
+    for (a, b), stats in pairings.items():
+        stats["win_rate_" + a] = stats["wins_" + a] / stats["games"]
+        stats["win_rate_" + b] = stats["wins_" + b] / stats["games"]
+        stats["draw_rate"] = stats["draws"] / stats["games"]
+    elo = elo_ratings(elo_results, engines)
+    engine_stats = {}
+    for e in engines:
+        times = sorted(move_times[e])
+        total = sum(times)
+        engine_stats[e] = {"elo": elo[e], "moves": len(times),
+                           "moves_per_second": len(times) / total if total else None,
+                           "time_per_move": {"mean": total / len(times) if times else None,
+                                             "p50": _percentile(times, 0.5),
+                                             "p90": _percentile(times, 0.9),
+                                             "p99": _percentile(times, 0.99),
+                                             "max": times[-1] if times else None}}
+    return {"engines": engine_stats,
+            "pairings": [dict(engines=list(pair), **stats) for pair, stats in pairings.items()]}
+
+
+def run_tournament(engines, n_games, seed=0, n_workers=None, game_log=None):
+    """ play n_games per pairing of engines, colours alternating, returns the game records.
+    with game_log (a GameLogWriter), each game is appended as soon as it is finished """
+    rng = random.Random(seed)
+    # resolved here, engines registered in this process are unknown to spawned workers
+    options = {e: engine_options(e) for e in engines}
+    games = []
+    for a, b in combinations(engines, 2):
+        for i in range(n_games):
+            engine_w, engine_b = (a, b) if i % 2 == 0 else (b, a)
+            games.append((engine_w, engine_b, rng.getrandbits(32), options[engine_w], options[engine_b]))
+    records = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for record in executor.map(play_game, *zip(*games)):
+            records.append(record)
+            if game_log is not None:
+                game_log.write([parse_move(m) for m in record["moves"]], record["winner"])
+    return records
+
+
+def write_csv(path, summary):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["engine", "opponent", "games", "wins", "draws", "losses", "win_rate",
+                         "draw_rate", "elo", "moves_per_second", "time_per_move_p50",
+                         "time_per_move_p99"])
+        for p in summary["pairings"]:
+            for engine, opponent in (p["engines"], p["engines"][::-1]):
+                e = summary["engines"][engine]
+                writer.writerow([engine, opponent, p["games"], p["wins_" + engine], p["draws"],
+                                 p["wins_" + opponent], p["win_rate_" + engine], p["draw_rate"],
+                                 e["elo"], e["moves_per_second"], e["time_per_move"]["p50"],
+                                 e["time_per_move"]["p99"]])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="self-play tournament between quantik engines")
+    parser.add_argument("engines", nargs="+",
+                        help="engine names (%s) or method@seconds" % ", ".join(ENGINES))
+    parser.add_argument("--games", type=int, default=10, help="games per pairing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument("--json", help="write summary and game records as json to this path")
+    parser.add_argument("--csv", help="write per pairing results as csv to this path")
+    parser.add_argument("--game-log", help="append the games to this binary game log (gamelog_quantik.py)")
+    args = parser.parse_args(argv)
+    if len(set(args.engines)) < 2:
+        parser.error("at least two different engines are needed")
+    for e in args.engines:
+        try:
+            engine_options(e)
+        except ValueError as error:
+            parser.error(str(error))
+
+    engines = list(dict.fromkeys(args.engines))
+    start = time.perf_counter()
+    game_log = GameLogWriter(args.game_log) if args.game_log else None
+    try:
+        records = run_tournament(engines, args.games, args.seed, args.workers, game_log)
+    finally:
+        if game_log is not None:
+            game_log.close()
+    summary = summarize(records, engines)
+    summary["wall_time"] = time.perf_counter() - start
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(summary, games=records), f, indent=1)
+    if args.csv:
+        write_csv(args.csv, summary)
+    for e, stats in summary["engines"].items():
+        print("%-16s elo %6.0f  %6d moves  p50 %.4fs  p99 %.4fs"
+              % (e, stats["elo"], stats["moves"], stats["time_per_move"]["p50"] or 0,
+                 stats["time_per_move"]["p99"] or 0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())